@@ -1,12 +1,15 @@
+import argparse
 import json
 import random
 import os
 import google.generativeai as genai
 import sqlite3
-from typing import Tuple, List, Optional
+from typing import Tuple, List
 import concurrent.futures
 import sys
 
+from word_index import WordIndex
+
 
 def get_clean_words(filepath):
     """
@@ -34,37 +37,6 @@ def get_clean_words(filepath):
     return list(words)
 
 
-def get_word_id(word: str) -> Optional[int]:
-    """
-    Retrieves the ID of a word from the database.
-
-    Args:
-        word: The word to search for.
-
-    Returns:
-        The ID of the word if found, otherwise None.
-    """
-    try:
-        conn = sqlite3.connect("vocabulary.db")  # Connect to the database
-        cursor = conn.cursor()
-
-        # Use a parameterized query to prevent SQL injection
-        cursor.execute("SELECT id FROM words WHERE word = ?", (word,))
-        result = cursor.fetchone()
-
-        if result:
-            return result[0]  # Return the ID
-        else:
-            return None  # Word not found
-
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return None
-    finally:
-        if conn:
-            conn.close()
-
-
 def create_default_preset_table(conn):
     """Creates the default_preset table if it doesn't exist."""
     try:
@@ -100,17 +72,21 @@ def insert_default_preset(conn, name: str, description: str, word_ids: list):
         print(f"Database error inserting preset: {e}")
 
 
-def main(filepath: str):
-    """Main function to add a preset to the database."""
+def main(filepath: str, casefold: bool = False):
+    """
+    Main function to add a preset to the database. With `casefold`, words
+    without an exact match are matched case-insensitively.
+    """
 
     words = get_clean_words(filepath)
     if not words:
         print("No words found in the file.")
         return
 
+    word_index = WordIndex("vocabulary.db", casefold)  # One query for the whole list
     word_ids = []
     for word in words:
-        word_id = get_word_id(word)
+        word_id = word_index.get(word)
         if word_id:
             word_ids.append(str(word_id))  # Convert to string for joining
         else:
@@ -134,5 +110,13 @@ def main(filepath: str):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add the TOEFL preset to the database.")
+    parser.add_argument(
+        "--casefold",
+        action="store_true",
+        help="Match words case-insensitively when there is no exact match",
+    )
+    args = parser.parse_args()
+
     filepath = "toefl_word_list.txt"
-    main(filepath)
+    main(filepath, args.casefold)
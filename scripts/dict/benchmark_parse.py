@@ -0,0 +1,146 @@
+import csv
+import io
+import json
+import random
+import re
+import sys
+import time
+
+from description_parser import parse_row
+
+# --- Configuration ---
+NUM_ROWS = 200000
+SEED = 0
+
+# Rows that exercise the corner cases of the original regex pipeline
+EDGE_CASES = [
+    ["colour", "/ˈkʌlə/ (US color /ˈkʌlər/) 1 n. hue: red 2 v. to paint"],
+    ["blank", "(US ) 1 first 2 second (US other)"],
+    ["two", "(US a) (US b) 1 one"],
+    ["nested", "a/b (US c/d) e/ 1 x"],
+    ["digits", "3: 4 x 10  y 2z 5\tz 6\nw"],
+    ["unicode", "１ 全形 ２ 數字 3 three"],
+    ["colons", "1 a:  b: c 2 :d"],
+    ["none", "no numbers here: at all"],
+    ["empty", ""],
+    ["commas", "1 one", " two", "three"],
+    ["multiline", "1 first\nline 2 second"],
+    ["word1 2", "a1 2 b"],
+]
+
+
+# --- Original Implementation (baseline) ---
+def legacy_parse_row(row, single_sense_fallback=True):
+    """The per-row code of parse.py/parse2.py before description_parser."""
+    word = row[0].strip()
+    rest_of_line = ",".join(row[1:]).strip()  # Rejoin in case of commas
+
+    # Remove pronunciation
+    rest_of_line = re.sub(r"\/[^\/]+\/\s*", "", rest_of_line)
+
+    # Parse US Variant
+    us_variant_match = re.search(r"\(US\s(.*?)\)", rest_of_line)
+    us_variant = us_variant_match.group(1).strip() if us_variant_match else None
+    if us_variant:
+        rest_of_line = re.sub(r"\(US\s(.*?)\)", "", rest_of_line)  # remove us variant
+
+    # Find all numbered definitions
+    descriptions = []
+    for match in re.finditer(r"\b\d+\s+(.*?)(?=\b\d+\s|\Z)", rest_of_line, re.DOTALL):
+        cleaned_description = match.group(1).replace(": ", ":\n")
+        descriptions.append(cleaned_description)
+
+    # If no numbered definitions, treat the entire remaining text as a single definition
+    if single_sense_fallback and not descriptions:
+        cleaned_description = rest_of_line.replace(": ", ":\n")
+        descriptions.append(cleaned_description)
+
+    if us_variant:
+        descriptions.append("US Variant: " + us_variant)
+
+    return word, json.dumps(descriptions)
+
+
+# --- Synthetic Data ---
+def synthetic_csv(num_rows, seed=SEED):
+    """Builds a dictionary.csv-like file in memory and returns its text."""
+    rng = random.Random(seed)
+    words = ["light", "account", "ligature", "run", "set", "colour", "analyse"]
+    glosses = [
+        "n. 光，光線: the light of the sun",
+        "v. 點燃: to light a fire",
+        "adj. 輕的; 淺色的",
+        "a. 帳戶, 戶口",
+        "vt. 把…看作: account him wise",
+        "phr. take into account 考慮到",
+        "n. 1990s 年代",
+    ]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["word", "description"])
+    for i in range(num_rows):
+        parts = []
+        if rng.random() < 0.7:
+            parts.append(f"/ˈwɜːd{i % 97}/")
+        if rng.random() < 0.1:
+            parts.append(f"(US variant{i % 13} /ˈvɛr/)")
+        senses = rng.randint(0, 6)
+        if senses == 0:
+            parts.append(rng.choice(glosses))
+        for number in range(1, senses + 1):
+            parts.append(f"{number} {rng.choice(glosses)}")
+        if rng.random() < 0.05:
+            parts.append("\n(see also 2 more)")
+        writer.writerow([f"{rng.choice(words)}{i}", " ".join(parts)])
+    return buffer.getvalue()
+
+
+def read_rows(text):
+    reader = csv.reader(io.StringIO(text))
+    next(reader)  # Skip header row
+    return [row for row in reader if row]
+
+
+# --- Equivalence Check and Benchmark ---
+def check_equivalence(rows):
+    """Returns the rows where the new parser differs from the original."""
+    mismatches = []
+    for row in EDGE_CASES + rows:
+        for fallback in (False, True):
+            if parse_row(row, fallback) != legacy_parse_row(row, fallback):
+                mismatches.append((row, fallback))
+    return mismatches
+
+
+def time_parser(parser, rows, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for row in rows:
+            parser(row, True)
+        best = min(best, time.perf_counter() - start)
+    return len(rows) / best
+
+
+def run_benchmark(num_rows=NUM_ROWS):
+    rows = read_rows(synthetic_csv(num_rows))
+    print(f"Synthetic CSV: {len(rows)} rows")
+
+    mismatches = check_equivalence(rows)
+    if mismatches:
+        print(f"MISMATCH in {len(mismatches)} rows, e.g.:")
+        for row, fallback in mismatches[:5]:
+            print(f"  fallback={fallback}: {row}")
+            print(f"    original: {legacy_parse_row(row, fallback)[1]}")
+            print(f"    new:      {parse_row(row, fallback)[1]}")
+        sys.exit(1)
+    print("Output identical to the original parser (with and without fallback)")
+
+    legacy_rate = time_parser(legacy_parse_row, rows)
+    new_rate = time_parser(parse_row, rows)
+    print(f"original   {legacy_rate:>12,.0f} rows/s")
+    print(f"new        {new_rate:>12,.0f} rows/s  ({new_rate / legacy_rate:.1f}x)")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else NUM_ROWS)
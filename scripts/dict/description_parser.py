@@ -0,0 +1,158 @@
+import csv
+import io
+import json
+import mmap
+import os
+import re
+
+# --- Precompiled Patterns ---
+PRONUNCIATION = re.compile(r"\/[^\/]+\/\s*")
+US_VARIANT = re.compile(r"\(US\s(.*?)\)")
+# A sense number: the text after one runs up to the next one (or the end)
+SENSE_MARKER = re.compile(r"\b\d+\s+")
+
+MIN_CHUNK_BYTES = 1 << 20  # Smallest byte range handed to a worker process
+
+
+def extract_us_variant(text):
+    """
+    Removes every "(US ...)" group from `text` in a single substitution.
+
+    Returns:
+        (text, us_variant). As in the original parsers, nothing is removed
+        and us_variant is None when the first group is blank.
+    """
+    variants = []
+    stripped = US_VARIANT.sub(lambda match: variants.append(match.group(1)) or "", text)
+    if variants and variants[0].strip():
+        return stripped, variants[0].strip()
+    return text, None
+
+
+def parse_description(rest_of_line, single_sense_fallback=True):
+    """
+    Splits the definition column of dictionary.csv into its senses.
+
+    Pronunciations (/.../) are dropped, the first US variant is moved to
+    the end as "US Variant: ...", the text is split at the sense numbers and
+    a line break is added after every ": ". Each step is a single C-level
+    regex call, skipped when its marker character is absent.
+
+    Args:
+        rest_of_line: Everything after the headword, already stripped.
+        single_sense_fallback: Treat unnumbered text as one sense
+                  (parse2.py) instead of dropping it (parse.py).
+
+    Returns:
+        The list of description strings.
+    """
+    if "/" in rest_of_line:
+        rest_of_line = PRONUNCIATION.sub("", rest_of_line)
+
+    us_variant = None
+    if "(US" in rest_of_line:
+        rest_of_line, us_variant = extract_us_variant(rest_of_line)
+
+    # ": " never overlaps a sense number, so one replace covers every sense
+    rest_of_line = rest_of_line.replace(": ", ":\n")
+    descriptions = SENSE_MARKER.split(rest_of_line)
+    del descriptions[0]  # Text before the first number
+
+    if not descriptions and single_sense_fallback:
+        descriptions.append(rest_of_line)
+    if us_variant:
+        descriptions.append("US Variant: " + us_variant)
+    return descriptions
+
+
+def parse_row(row, single_sense_fallback=True):
+    """
+    Parses one dictionary.csv record.
+
+    Returns:
+        (word, description_json) ready for the words table.
+    """
+    word = row[0].strip()
+    if len(row) == 2:
+        rest_of_line = row[1].strip()
+    else:
+        rest_of_line = ",".join(row[1:]).strip()  # Rejoin in case of commas
+    descriptions = parse_description(rest_of_line, single_sense_fallback)
+    return word, json.dumps(descriptions)
+
+
+# --- Parallel Ingestion ---
+def split_csv_records(csv_filepath, num_chunks, min_chunk_bytes=MIN_CHUNK_BYTES):
+    """
+    Splits a CSV file into about `num_chunks` byte ranges that each start
+    and end on a record boundary.
+
+    A newline ends a record only outside a quoted field, which is known from
+    the parity of the quote characters before it (escaped quotes come in
+    pairs). The quotes are counted with bytes.count, so finding the
+    boundaries is one C-speed pass over the file. Assumes well-formed
+    (RFC 4180) quoting.
+
+    Returns:
+        A list of (start, end) byte offsets covering the whole file in order.
+    """
+    size = os.path.getsize(csv_filepath)
+    if size == 0:
+        return []
+    chunk_bytes = max(min_chunk_bytes, size // max(num_chunks, 1) + 1)
+
+    with open(csv_filepath, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            ranges = []
+            start = 0
+            quotes = 0  # Quote characters in data[:position]
+            position = 0
+            while start < size:
+                target = start + chunk_bytes
+                if target >= size:
+                    ranges.append((start, size))
+                    break
+                quotes += data[position:target].count(b'"')
+                position = target
+                end = size
+                while True:
+                    newline = data.find(b"\n", position)
+                    if newline == -1:
+                        break
+                    quotes += data[position:newline].count(b'"')
+                    position = newline
+                    if quotes % 2 == 0:
+                        end = newline + 1
+                        break
+                    position = newline + 1
+                ranges.append((start, end))
+                start = end
+    return ranges
+
+
+def parse_csv_range(csv_filepath, start, end, single_sense_fallback=True):
+    """
+    Worker for the parallel mode: parses the records in [start, end).
+
+    The bytes are decoded and read with the same universal-newline text
+    handling that open() gives the sequential parser.
+
+    Returns:
+        (rows, errors): the (word, description_json) pairs in file order and
+        the error messages for rows that could not be parsed.
+    """
+    with open(csv_filepath, "rb") as file:
+        file.seek(start)
+        chunk = file.read(end - start)
+
+    rows = []
+    errors = []
+    reader = csv.reader(io.TextIOWrapper(io.BytesIO(chunk), encoding="utf-8"))
+    for row in reader:
+        if not row:  # Skip empty rows
+            continue
+        try:
+            rows.append(parse_row(row, single_sense_fallback))
+        except Exception as e:
+            errors.append(f"Error processing row: {row}, Error: {e}")
+    return rows, errors
@@ -0,0 +1,148 @@
+import csv
+import hashlib
+import json
+
+from description_parser import parse_row
+
+# --- Configuration ---
+PARSER_VERSION = "1"  # Bump when parse_row's output changes to re-ingest every row
+DIFF_FILE = "ingest_diff.json"
+REFRESH_FILE = "reenrich_words.txt"  # Input for parse3.py --refresh
+
+
+def source_hash(row, single_sense_fallback):
+    """Content hash of one CSV record together with the parser settings."""
+    digest = hashlib.sha256()
+    digest.update(f"{PARSER_VERSION}:{int(single_sense_fallback)}".encode("utf-8"))
+    for field in row:
+        encoded = field.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+def ensure_hash_column(cursor):
+    cursor.execute("PRAGMA table_info(words)")
+    if "content_hash" not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE words ADD COLUMN content_hash TEXT")
+
+
+def read_latest_records(csv_filepath, single_sense_fallback):
+    """
+    Returns {word: (hash, row)} for the CSV. Like INSERT OR REPLACE, the
+    last record of a duplicated headword wins.
+    """
+    latest = {}
+    with open(csv_filepath, "r", encoding="utf-8") as file:
+        for row in csv.reader(file):
+            if not row:  # Skip empty rows
+                continue
+            latest[row[0].strip()] = (source_hash(row, single_sense_fallback), row)
+    return latest
+
+
+def ingest_incremental(
+    conn,
+    csv_filepath,
+    single_sense_fallback=True,
+    diff_path=DIFF_FILE,
+    refresh_path=REFRESH_FILE,
+):
+    """
+    Brings the words table in line with the CSV, touching only what changed.
+
+    Every row stores the hash of the record it was parsed from. Records
+    whose hash matches are skipped without being parsed, changed ones are
+    parsed and UPDATEd in place (so their rowid, the word id, stays the
+    same) and new ones are INSERTed. Words no longer in the CSV are
+    reported, not deleted. Rows from before the hash column existed are
+    compared by description the first time and only count as changed if it
+    differs.
+
+    A summary with the ids and words that were added, changed or deleted is
+    written to `diff_path`, and the added and changed words (the ones that
+    need re-enrichment) to `refresh_path`, one per line.
+
+    Returns:
+        The summary dict.
+    """
+    cursor = conn.cursor()
+    ensure_hash_column(cursor)
+
+    stored = {}  # word -> (rowid, hash, description if the hash is missing)
+    cursor.execute(
+        "SELECT word, rowid, content_hash, "
+        "CASE WHEN content_hash IS NULL THEN description END FROM words"
+    )
+    for word, rowid, content_hash, description in cursor:
+        stored[word] = (rowid, content_hash, description)
+
+    latest = read_latest_records(csv_filepath, single_sense_fallback)
+
+    inserts = []
+    updates = []
+    hash_only = []
+    changed = []
+    unchanged = 0
+    for word, (digest, row) in latest.items():
+        old = stored.get(word)
+        if old is not None and old[1] == digest:
+            unchanged += 1
+            continue
+        try:
+            word, description_json = parse_row(row, single_sense_fallback)
+        except Exception as e:
+            print(f"Error processing row: {row}, Error: {e}")
+            continue
+
+        if old is None:
+            inserts.append((word, description_json, digest))
+        elif old[1] is None and old[2] == description_json:
+            hash_only.append((digest, word))
+        else:
+            updates.append((description_json, digest, word))
+            changed.append({"id": old[0], "word": word})
+
+    cursor.executemany(
+        "INSERT INTO words (word, description, content_hash) VALUES (?, ?, ?)",
+        inserts,
+    )
+    cursor.executemany(
+        "UPDATE words SET description = ?, content_hash = ? WHERE word = ?", updates
+    )
+    cursor.executemany("UPDATE words SET content_hash = ? WHERE word = ?", hash_only)
+    conn.commit()
+
+    added = []
+    inserted_words = [word for word, _, _ in inserts]
+    for i in range(0, len(inserted_words), 500):  # SQLite variable limit
+        chunk = inserted_words[i : i + 500]
+        cursor.execute(
+            f"SELECT rowid, word FROM words WHERE word IN ({','.join('?' * len(chunk))})",
+            chunk,
+        )
+        added.extend({"id": rowid, "word": word} for rowid, word in cursor.fetchall())
+    deleted = [
+        {"id": rowid, "word": word}
+        for word, (rowid, _, _) in stored.items()
+        if word not in latest
+    ]
+
+    summary = {
+        "added": added,
+        "changed": changed,
+        "deleted": deleted,
+        "unchanged": unchanged + len(hash_only),
+    }
+    with open(diff_path, "w", encoding="utf-8") as file:
+        json.dump(summary, file, ensure_ascii=False, indent=2)
+    with open(refresh_path, "w", encoding="utf-8") as file:
+        for entry in added + changed:
+            file.write(entry["word"] + "\n")
+
+    print(
+        f"Incremental ingest: {len(added)} added, {len(changed)} changed, "
+        f"{len(deleted)} deleted (kept), {summary['unchanged']} unchanged"
+    )
+    print(f"Diff written to {diff_path}; words to re-enrich listed in {refresh_path}")
+    return summary
@@ -1,10 +1,14 @@
+import argparse
 import csv
 import sqlite3
-import re
 import json
 
+from description_parser import parse_row
+from incremental_ingest import ingest_incremental
 
-def parse_csv_to_sqlite(csv_filepath, db_filepath):
+
+def parse_csv_to_sqlite(csv_filepath, db_filepath, incremental=False):
+    conn = None
     try:
         conn = sqlite3.connect(db_filepath)
         cursor = conn.cursor()
@@ -16,6 +20,10 @@ def parse_csv_to_sqlite(csv_filepath, db_filepath):
             )
         """)
 
+        if incremental:
+            ingest_incremental(conn, csv_filepath, single_sense_fallback=False)
+            return
+
         with open(csv_filepath, "r", encoding="utf-8") as file:
             reader = csv.reader(file)
             for row in reader:
@@ -23,37 +31,9 @@ def parse_csv_to_sqlite(csv_filepath, db_filepath):
                     continue
 
                 try:
-                    word = row[0].strip()
-                    rest_of_line = ",".join(
-                        row[1:]
-                    ).strip()  # Rejoin in case of commas in definition
-
-                    # Remove pronunciation
-                    rest_of_line = re.sub(r"\/[^\/]+\/\s*", "", rest_of_line)
-
-                    # Parse US Variant
-                    us_variant_match = re.search(r"\(US\s(.*?)\)", rest_of_line)
-                    us_variant = (
-                        us_variant_match.group(1).strip() if us_variant_match else None
+                    word, description_json = parse_row(
+                        row, single_sense_fallback=False
                     )
-                    if us_variant:
-                        rest_of_line = re.sub(
-                            r"\(US\s(.*?)\)", "", rest_of_line
-                        )  # remove us variant
-
-                    # Find all numbered definitions, add linebreaks, and keep only the text after the number
-                    descriptions = []
-                    for match in re.finditer(
-                        r"\b\d+\s+(.*?)(?=\b\d+\s|\Z)", rest_of_line, re.DOTALL
-                    ):
-                        # Add line break after each colon
-                        cleaned_description = match.group(1).replace(": ", ":\n")
-                        descriptions.append(cleaned_description)
-
-                    if us_variant:
-                        descriptions.append("US Variant: " + us_variant)
-
-                    description_json = json.dumps(descriptions)
 
                     cursor.execute(
                         "INSERT OR REPLACE INTO words (word, description) VALUES (?, ?)",
@@ -76,13 +56,6 @@ def parse_csv_to_sqlite(csv_filepath, db_filepath):
             conn.close()
 
 
-# Example usage (same as before)
-csv_file = "dictionary.csv"  # Replace with your CSV file path
-db_file = "dictionary.db"  # Replace with your desired DB file path
-
-parse_csv_to_sqlite(csv_file, db_file)
-
-
 # Verification Code
 def verify_data(db_filepath, word_to_check):
     try:
@@ -107,9 +80,26 @@ def verify_data(db_filepath, word_to_check):
             conn.close()
 
 
-# Example Usage
-verify_data(db_file, "light")
-verify_data(db_file, "accordingly")
-verify_data(db_file, "ligature")
-verify_data(db_file, "account")
-verify_data(db_file, "empty")  # test non-existing word
+if __name__ == "__main__":
+    # Example usage (same as before)
+    csv_file = "dictionary.csv"  # Replace with your CSV file path
+    db_file = "dictionary.db"  # Replace with your desired DB file path
+
+    parser = argparse.ArgumentParser(description="Parse dictionary.csv into SQLite.")
+    parser.add_argument("--csv", default=csv_file, help="Input dictionary CSV")
+    parser.add_argument("--db", default=db_file, help="Output SQLite database")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only write rows whose source record changed and report a diff",
+    )
+    args = parser.parse_args()
+
+    parse_csv_to_sqlite(args.csv, args.db, args.incremental)
+
+    # Example Usage
+    verify_data(args.db, "light")
+    verify_data(args.db, "accordingly")
+    verify_data(args.db, "ligature")
+    verify_data(args.db, "account")
+    verify_data(args.db, "empty")  # test non-existing word
@@ -1,10 +1,18 @@
+import argparse
 import csv
 import sqlite3
-import re
 import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
+from description_parser import parse_csv_range, parse_row, split_csv_records
+from incremental_ingest import ingest_incremental
 
-def parse_csv_to_sqlite(csv_filepath, db_filepath):
+CHUNKS_PER_WORKER = 4  # Byte ranges per worker, so a slow range doesn't stall the merge
+
+
+def parse_csv_to_sqlite(csv_filepath, db_filepath, workers=1, incremental=False):
+    conn = None
     try:
         conn = sqlite3.connect(db_filepath)
         cursor = conn.cursor()
@@ -16,6 +24,16 @@ def parse_csv_to_sqlite(csv_filepath, db_filepath):
             )
         """)
 
+        if incremental:  # Only changed rows are parsed, so no need for workers
+            ingest_incremental(conn, csv_filepath, single_sense_fallback=True)
+            return
+
+        if workers > 1:
+            parse_csv_parallel(csv_filepath, cursor, workers)
+            conn.commit()
+            print("Parsing complete. Data inserted into the database.")
+            return
+
         with open(csv_filepath, "r", encoding="utf-8") as file:
             reader = csv.reader(file)
             for row in reader:
@@ -23,39 +41,9 @@ def parse_csv_to_sqlite(csv_filepath, db_filepath):
                     continue
 
                 try:
-                    word = row[0].strip()
-                    rest_of_line = ",".join(row[1:]).strip()  # Rejoin in case of commas
-
-                    # Remove pronunciation
-                    rest_of_line = re.sub(r"\/[^\/]+\/\s*", "", rest_of_line)
-
-                    # Parse US Variant
-                    us_variant_match = re.search(r"\(US\s(.*?)\)", rest_of_line)
-                    us_variant = (
-                        us_variant_match.group(1).strip() if us_variant_match else None
+                    word, description_json = parse_row(
+                        row, single_sense_fallback=True
                     )
-                    if us_variant:
-                        rest_of_line = re.sub(
-                            r"\(US\s(.*?)\)", "", rest_of_line
-                        )  # remove us variant
-
-                    # Find all numbered definitions
-                    descriptions = []
-                    for match in re.finditer(
-                        r"\b\d+\s+(.*?)(?=\b\d+\s|\Z)", rest_of_line, re.DOTALL
-                    ):
-                        cleaned_description = match.group(1).replace(": ", ":\n")
-                        descriptions.append(cleaned_description)
-
-                    # If no numbered definitions, treat the entire remaining text as a single definition
-                    if not descriptions:
-                        cleaned_description = rest_of_line.replace(": ", ":\n")
-                        descriptions.append(cleaned_description)
-
-                    if us_variant:
-                        descriptions.append("US Variant: " + us_variant)
-
-                    description_json = json.dumps(descriptions)
 
                     cursor.execute(
                         "INSERT OR REPLACE INTO words (word, description) VALUES (?, ?)",
@@ -78,11 +66,33 @@ def parse_csv_to_sqlite(csv_filepath, db_filepath):
             conn.close()
 
 
-# Example usage (same as before)
-csv_file = "dictionary.csv"  # Replace with your CSV file path
-db_file = "dictionary.db"  # Replace with your desired DB file path
+def parse_csv_parallel(csv_filepath, cursor, workers):
+    """
+    Parses byte ranges of the CSV (split on record boundaries) in `workers`
+    processes and writes the results through `cursor` in file order, so a
+    duplicate headword ends up with the same row as in the sequential
+    INSERT OR REPLACE loop.
+    """
+    ranges = split_csv_records(csv_filepath, workers * CHUNKS_PER_WORKER)
+    print(f"Parsing {len(ranges)} ranges with {workers} processes")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for start, end in ranges:
+            pending.append(executor.submit(parse_csv_range, csv_filepath, start, end))
+            if len(pending) >= 2 * workers:
+                write_parsed_range(cursor, pending.popleft().result())
+        while pending:
+            write_parsed_range(cursor, pending.popleft().result())
+
 
-parse_csv_to_sqlite(csv_file, db_file)
+def write_parsed_range(cursor, result):
+    rows, errors = result
+    for error in errors:
+        print(error)
+    cursor.executemany(
+        "INSERT OR REPLACE INTO words (word, description) VALUES (?, ?)", rows
+    )
 
 
 # Verification Code
@@ -109,9 +119,32 @@ def verify_data(db_filepath, word_to_check):
             conn.close()
 
 
-# Example Usage
-verify_data(db_file, "light")
-verify_data(db_file, "accordingly")
-verify_data(db_file, "ligature")
-verify_data(db_file, "account")
-verify_data(db_file, "empty")  # test non-existing word
+if __name__ == "__main__":
+    # Example usage (same as before)
+    csv_file = "dictionary.csv"  # Replace with your CSV file path
+    db_file = "dictionary.db"  # Replace with your desired DB file path
+
+    parser = argparse.ArgumentParser(description="Parse dictionary.csv into SQLite.")
+    parser.add_argument("--csv", default=csv_file, help="Input dictionary CSV")
+    parser.add_argument("--db", default=db_file, help="Output SQLite database")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes parsing byte ranges of the CSV in parallel",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only write rows whose source record changed and report a diff",
+    )
+    args = parser.parse_args()
+
+    parse_csv_to_sqlite(args.csv, args.db, args.workers, args.incremental)
+
+    # Example Usage
+    verify_data(args.db, "light")
+    verify_data(args.db, "accordingly")
+    verify_data(args.db, "ligature")
+    verify_data(args.db, "account")
+    verify_data(args.db, "empty")  # test non-existing word
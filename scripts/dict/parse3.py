@@ -1,18 +1,42 @@
+import argparse
+import asyncio
 import csv
 import sqlite3
 import json
-import google.generativeai as genai
 import os
 import time
 import threading
 import queue  # For thread-safe queue
+import sys
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from llm_backend import create_backend  # noqa: E402
+from llm_cache import LLMCache, make_cache_key  # noqa: E402
+from llm_json import (  # noqa: E402
+    REPAIR_TRUNCATED,
+    LLMJSONError,
+    parse_llm_json,
+    validate_enrichment,
+)
+from pipeline_metrics import METRICS_INTERVAL, PipelineMetrics  # noqa: E402
+
 # --- Configuration ---
 CSV_FILE = "dictionary.csv"
 DB_FILE = "vocabulary.db"
+JOURNAL_FILE = "enrich_checkpoint.jsonl"
 MODEL_NAME = "gemini-2.0-flash"
 NUM_THREADS = 100  # Adjust based on your system and API limits
+MAX_IN_FLIGHT = 200  # Concurrent requests in --mode async
+REQUESTS_PER_MINUTE = 2000  # 0 disables the request rate limit
+TOKENS_PER_MINUTE = 4000000  # 0 disables the token rate limit
+EST_OUTPUT_TOKENS = 1500  # Reserved per request until the real usage is known
+WRITER_BATCH_SIZE = 200  # Words per writer transaction
+WRITER_FLUSH_SECONDS = 5.0  # Commit at least this often while results trickle in
+SQLITE_MAX_VARIABLES = 500  # Chunk size for "IN (?, ?, ...)" lookups
+METRICS_JSONL_FILE = "enrich_metrics.jsonl"
+METRICS_PROM_FILE = "enrich_metrics.prom"
+VERBOSE = False  # --verbose: also log raw LLM responses and per-batch progress
 
 # --- LLM Prompt (Provided in the Question) ---
 prompt = """
@@ -95,14 +119,19 @@ The top-level JSON object must contain the following keys:
 Now, parse the following complete dictionary entry text block, applying all extraction, translation, generation, and summarization rules:
 """
 
+# --- Appended to the prompt when several headwords share one request ---
+batch_prompt = (
+    prompt
+    + """
+**Batch Mode:** The input below contains several complete dictionary entries, each introduced by a line `### Headword: <word>`. Apply all of the rules above to every entry independently.
+Output ONLY a JSON array with one element per headword, in the same order as the input. Each element must be a JSON object with a `word` key holding the headword exactly as given, plus the `short_translation_summary` and `senses` keys described above.
+"""
+)
+
 
-# --- Initialize Google Generative AI API ---
-def initialize_genai():
-    API_KEY = os.environ.get("GEMINI_API_KEY")
-    if not API_KEY:
-        raise ValueError("Please set the GEMINI_API_KEY environment variable.")
-    genai.configure(api_key=API_KEY)
-    return genai.GenerativeModel(MODEL_NAME)
+# --- Initialize the LLM Backend (Gemini unless --backend/LLM_BACKEND says otherwise) ---
+def initialize_backend(spec=None):
+    return create_backend(spec, default_model=MODEL_NAME)
 
 
 # --- Database Setup (Modified) ---
@@ -151,171 +180,693 @@ def create_database_schema(db_file):
     conn.close()
 
 
+def _dedupe_natural_keys(cursor):
+    """
+    Makes (word_id, sense_order) and (sense_id, example_order) unique. Rows
+    that repeat both the key and the content are copies from re-running a
+    word and are removed, keeping the newest. Distinct rows that share an
+    order (the model left it out and it was stored as 0) are kept and
+    renumbered by id after the smallest order of their word or sense.
+
+    Returns:
+        The number of removed senses, orphaned examples, removed examples,
+        renumbered senses and renumbered examples.
+    """
+    cursor.execute(
+        """
+        DELETE FROM senses WHERE sense_id NOT IN (
+            SELECT MAX(sense_id) FROM senses
+            GROUP BY word_id, sense_order, translation_chn, definition_eng, part_of_speech
+        )
+    """
+    )
+    duplicate_senses = cursor.rowcount
+    cursor.execute(
+        "DELETE FROM examples WHERE sense_id NOT IN (SELECT sense_id FROM senses)"
+    )
+    orphaned_examples = cursor.rowcount
+    cursor.execute(
+        """
+        DELETE FROM examples WHERE example_id NOT IN (
+            SELECT MAX(example_id) FROM examples
+            GROUP BY sense_id, example_order, phrase_marker, sentence_eng, sentence_chn
+        )
+    """
+    )
+    duplicate_examples = cursor.rowcount
+
+    renumbered = []
+    for table, row_id, parent_id, order in (
+        ("senses", "sense_id", "word_id", "sense_order"),
+        ("examples", "example_id", "sense_id", "example_order"),
+    ):
+        cursor.execute(
+            f"""
+            UPDATE {table} SET {order} = renumbered.new_order
+            FROM (
+                SELECT {row_id} AS id, {order} AS old_order,
+                    MIN({order}) OVER (PARTITION BY {parent_id})
+                    + ROW_NUMBER() OVER (PARTITION BY {parent_id} ORDER BY {order}, {row_id})
+                    - 1 AS new_order
+                FROM {table}
+                WHERE {parent_id} IN (
+                    SELECT {parent_id} FROM {table}
+                    GROUP BY {parent_id}, {order} HAVING COUNT(*) > 1
+                )
+            ) AS renumbered
+            WHERE {table}.{row_id} = renumbered.id
+                AND renumbered.new_order != renumbered.old_order
+        """
+        )
+        renumbered.append(cursor.rowcount)
+
+    return (
+        duplicate_senses,
+        orphaned_examples,
+        duplicate_examples,
+        renumbered[0],
+        renumbered[1],
+    )
+
+
+def create_natural_key_indexes(db_file, dry_run=False):
+    """
+    Enforces the natural keys used by --upsert: (word_id, sense_order) for
+    senses and (sense_id, example_order) for examples, after fixing the rows
+    earlier append-only runs left behind (see _dedupe_natural_keys).
+
+    The database is backed up next to itself before any row is changed.
+    With `dry_run` the changes are only reported.
+    """
+    conn = sqlite3.connect(db_file)
+    try:
+        cursor = conn.cursor()
+        changes = _dedupe_natural_keys(cursor)
+        if any(changes):
+            print(
+                "Natural key migration: removes {} duplicate senses, {} orphaned "
+                "examples and {} duplicate examples; renumbers {} senses and {} "
+                "examples".format(*changes)
+            )
+            conn.rollback()
+            if dry_run:
+                return
+            backup_path = f"{db_file}.{time.strftime('%Y%m%d-%H%M%S')}.bak"
+            backup = sqlite3.connect(backup_path)
+            conn.backup(backup)
+            backup.close()
+            print(f"Backed up {db_file} to {backup_path}")
+            _dedupe_natural_keys(cursor)
+        elif dry_run:
+            print("Natural key migration: nothing to change")
+            return
+
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_senses_word_order ON senses (word_id, sense_order)"
+        )
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_examples_sense_order ON examples (sense_id, example_order)"
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
 # --- Retry Decorator for API Calls ---
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
 def generate_content_with_retry(model, full_prompt):
-    response = model.generate_content(full_prompt)
+    response = model.generate(full_prompt)
     return response
 
 
-# --- Worker Function for Threading ---
-def worker(queue, model):
-    while True:
-        item = queue.get()
-        if item is None:
-            break  # Sentinel value to signal thread to exit
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+async def generate_content_async_with_retry(model, full_prompt):
+    response = await model.generate_async(full_prompt)
+    return response
 
-        word, description = item
 
-        # --- Database Connection within Thread ---
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
+# --- Prompt / Response Helpers ---
+def build_full_prompt(description):
+    return prompt + f"\n**Input Text Block:**\n```\n{description}\n```"
+
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token) used for rate limiting."""
+    return len(text) // 4 + 1
+
+
+def build_batch_input(batch):
+    """Input text for a batched request: one labelled block per headword."""
+    return "".join(
+        f"\n### Headword: {word}\n```\n{description}\n```\n"
+        for word, description in batch
+    )
+
+
+def decode_enrichment(response_text, metrics):
+    """
+    Extracts, repairs and validates a single-word response. A truncated
+    response is rejected even though it can be closed and parsed: its last
+    sense or example would be stored incomplete and the word marked done.
+
+    Raises:
+        LLMJSONError: if the response can't be turned into a valid result.
+    """
+    with metrics.time("json_decode"):
+        data, repair = parse_llm_json(response_text)
+        errors = validate_enrichment(data)
+    if repair == REPAIR_TRUNCATED:
+        metrics.inc("json_truncated")
+        raise LLMJSONError("Response was truncated")
+    if repair:
+        metrics.inc("json_repaired")
+    if errors:
+        raise LLMJSONError("; ".join(errors))
+    return data
+
+
+def parse_batch_response(response_text, words):
+    """
+    Splits a batched response into {word: data}. Each element is validated on
+    its own, so one malformed headword doesn't discard the rest of the batch;
+    words missing from the result need a single-word retry. When the response
+    was cut off, its last element is incomplete and is dropped as well.
+    """
+    try:
+        items, repair = parse_llm_json(response_text)
+    except LLMJSONError:
+        return {}
+    if isinstance(items, dict):  # Tolerate {"word": {...}} instead of an array
+        items = [
+            dict(value, word=key) for key, value in items.items() if isinstance(value, dict)
+        ]
+    if not isinstance(items, list):
+        return {}
+    if repair == REPAIR_TRUNCATED:
+        items = items[:-1]
+
+    wanted = set(words)
+    results = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        word = item.pop("word", None)
+        if word in wanted and not validate_enrichment(item):
+            results[word] = item
+    return results
+
+
+def batched(entries, batch_size):
+    """Groups (word, description) entries into lists of up to batch_size."""
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def natural_order(items, order_key):
+    """
+    Yields (order, item) pairs keyed by the model's `order_key`, falling back
+    to the list position when the model left orders out or repeated them.
+    """
+    orders = [item.get(order_key) for item in items]
+    if len(set(orders)) != len(orders) or not all(isinstance(o, int) for o in orders):
+        orders = range(len(items))
+    return zip(orders, items)
+
+
+# --- Single Writer Stage ---
+class EnrichmentWriter:
+    """
+    Owns the only write connection to the database. Workers hand it parsed
+    LLM JSON through `submit`; a background thread groups results into
+    transactions of `batch_size` words (or whatever arrived within
+    `flush_interval` seconds) and writes them with executemany.
 
+    With `upsert=True` the stored rows of each word are diffed against the
+    new result on their natural keys and only changed rows are touched, so
+    re-running a word is idempotent (see create_natural_key_indexes).
+
+    Words are appended to `journal` only once the transaction holding them
+    has committed, so a word whose write fails is requested again next run.
+    """
+
+    def __init__(
+        self,
+        db_file,
+        batch_size=WRITER_BATCH_SIZE,
+        flush_interval=WRITER_FLUSH_SECONDS,
+        metrics=None,
+        upsert=False,
+        journal=None,
+    ):
+        self.db_file = db_file
+        self.upsert = upsert
+        self.journal = journal
+        self.metrics = metrics or PipelineMetrics("enrich")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(
+            target=self._run, name="Writer", daemon=True
+        )
+        self.words_written = 0
+        self.rows_written = 0
+        self.started = None
+
+    def start(self):
+        self.started = time.monotonic()
+        self.thread.start()
+        return self
+
+    def submit(self, word, data):
+        """Queues one word's parsed JSON for writing. Thread-safe, never blocks."""
+        self.queue.put((word, data))
+
+    def close(self):
+        """Flushes everything still queued and stops the writer thread."""
+        self.queue.put(None)
+        self.thread.join()
+        elapsed = time.monotonic() - self.started
+        print(
+            f"Writer finished: {self.words_written} words, {self.rows_written} rows "
+            f"in {elapsed:.1f}s ({self.rows_written / max(elapsed, 1e-9):.0f} rows/sec)"
+        )
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_file)
         try:
-            print(f"Thread {threading.current_thread().name} processing: {word}")
+            pending = []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                timeout = max(deadline - time.monotonic(), 0)
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = False  # Flush interval elapsed
+
+                if item:
+                    pending.append(item)
+                if pending and (
+                    item is None
+                    or len(pending) >= self.batch_size
+                    or time.monotonic() >= deadline
+                ):
+                    self._flush(conn, pending)
+                    pending = []
+                if item is None:
+                    break
+                if time.monotonic() >= deadline:
+                    deadline = time.monotonic() + self.flush_interval
+        finally:
+            conn.close()
+
+    def _flush(self, conn, pending):
+        flush_started = time.monotonic()
+        try:
+            rows, written = self._write(conn.cursor(), pending)
+            conn.commit()
+            self._journal(written)
+        except sqlite3.Error as e:
+            # One bad word must not cost the whole batch: retry word by word
+            conn.rollback()
+            print(f"Writer batch of {len(pending)} failed ({e}), retrying per word")
+            rows = 0
+            for item in pending:
+                try:
+                    word_rows, written = self._write(conn.cursor(), [item])
+                    conn.commit()
+                    rows += word_rows
+                    self._journal(written)
+                except sqlite3.Error as word_error:
+                    conn.rollback()
+                    print(f"Writer Database Error for {item[0]}: {word_error}")
+
+        self.rows_written += rows
+        self.metrics.observe("sqlite_write", time.monotonic() - flush_started)
+        self.metrics.inc("rows_written", rows)
+        elapsed = time.monotonic() - self.started
+        print(
+            f"Writer committed {len(pending)} words ({rows} rows), "
+            f"{self.rows_written / max(elapsed, 1e-9):.0f} rows/sec overall"
+        )
+
+    def _journal(self, written):
+        """Marks committed words as done."""
+        if self.journal is not None:
+            for word in written:
+                self.journal.append(word)
+
+    @staticmethod
+    def _select_in(cursor, query, values):
+        """Runs `query` (with one "{}" for the IN list) over chunks of `values`."""
+        rows = []
+        values = list(values)
+        for i in range(0, len(values), SQLITE_MAX_VARIABLES):
+            chunk = values[i : i + SQLITE_MAX_VARIABLES]
+            cursor.execute(query.format(",".join("?" * len(chunk))), chunk)
+            rows.extend(cursor.fetchall())
+        return rows
+
+    def _write(self, cursor, pending):
+        """
+        Writes a batch without committing. Returns the number of rows and the
+        words that were written.
+        """
+        if self.upsert:
+            return self._write_upsert(cursor, pending)
 
-            # --- Check if short_translation_summary already exists ---
-            cursor.execute(
-                "SELECT short_translation_summary FROM words WHERE word = ?", (word,)
+        word_ids = dict(
+            self._select_in(
+                cursor,
+                "SELECT word, id FROM words WHERE word IN ({})",
+                {word for word, _ in pending},
             )
-            result = cursor.fetchone()
-            if result and result[0]:
-                print(
-                    f"Thread {threading.current_thread().name} Skipping {word} - short_translation_summary already exists"
-                )
-                continue  # Skip to the next word
-
-            # --- Construct LLM Prompt ---
-            full_prompt = prompt + f"\n**Input Text Block:**\n```\n{description}\n```"
-
-            # --- Call the LLM with Retry ---
-            try:
-                response = generate_content_with_retry(model, full_prompt)
-                json_string = response.text  # Extracting the JSON string
-                # --- Strip JSON tags ---
-                json_string = (
-                    json_string.strip().replace("```json", "").replace("```", "")
-                )
+        )
 
-                print(
-                    f"Thread {threading.current_thread().name} LLM response: {json_string}"
-                )  # Printing the raw response
-            except Exception as e:
-                print(
-                    f"Thread {threading.current_thread().name} LLM API Error after retry for {word}: {e}"
-                )
-                continue  # Skip to next word
+        # Sense ids are assigned here rather than read back through lastrowid,
+        # so senses and examples can both go through executemany. This is safe
+        # because the writer is the only connection inserting senses.
+        cursor.execute("SELECT COALESCE(MAX(sense_id), 0) FROM senses")
+        next_sense_id = cursor.fetchone()[0] + 1
 
-            # --- Parse JSON Response ---
-            try:
-                data = json.loads(json_string)
-            except json.JSONDecodeError as e:
-                print(
-                    f"Thread {threading.current_thread().name} JSON Decode Error for {word}: {e}"
-                )
-                print(
-                    f"Thread {threading.current_thread().name} Failing JSON String: {json_string}"
-                )
-                continue  # skip to next word
-
-            # --- Database Insertion (Modified)---
-            try:
-                # 1. Get the word_id from the existing words table
-                cursor.execute("SELECT id FROM words WHERE word = ?", (word,))
-                result = cursor.fetchone()
-                if not result:
-                    print(
-                        f"Thread {threading.current_thread().name} Word not found in 'words' table: {word}"
+        summary_rows, sense_rows, example_rows = [], [], []
+        written = []
+        for word, data in pending:
+            word_id = word_ids.get(word)
+            if word_id is None:
+                print(f"Writer Word not found in 'words' table: {word}")
+                continue
+            written.append(word)
+
+            summary_rows.append((data.get("short_translation_summary"), word_id))
+            # Missing or repeated orders are renumbered, as in _write_upsert, so
+            # the natural-key unique indexes never reject a result
+            for sense_order, sense_data in natural_order(
+                data.get("senses", []), "sense_order"  # Handle missing 'senses' key
+            ):
+                sense_id = next_sense_id
+                next_sense_id += 1
+                sense_rows.append(
+                    (
+                        sense_id,
+                        word_id,
+                        sense_order,
+                        sense_data.get("translation_chn"),
+                        sense_data.get("definition_eng"),
+                        sense_data.get("part_of_speech"),
+                        sense_data.get("original_input_text"),
                     )
-                    continue  # Skip to the next word if not found
-                word_id = result[0]
-
-                # 2. Update short translation summary
-                short_translation_summary = data.get(
-                    "short_translation_summary", None
-                )  # Handle missing field
-                cursor.execute(
-                    "UPDATE words SET short_translation_summary = ? WHERE id = ?",
-                    (short_translation_summary, word_id),
-                )  # update the short_translation in word table instead of creating another one.
-
-                # 3. Insert Senses and Examples
-                for sense_data in data.get("senses", []):  # Handle missing 'senses' key
-                    sense_order = sense_data.get(
-                        "sense_order", 0
-                    )  # Handle missing sense_order
-                    translation_chn = sense_data.get("translation_chn")
-                    definition_eng = sense_data.get("definition_eng")
-                    part_of_speech = sense_data.get("part_of_speech")
-                    original_input_text = sense_data.get("original_input_text")
-
-                    cursor.execute(
-                        """
-                        INSERT INTO senses (word_id, sense_order, translation_chn, definition_eng, part_of_speech, original_input_text)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """,
+                )
+                for example_order, example_data in natural_order(
+                    sense_data.get("examples", []), "example_order"
+                ):
+                    example_rows.append(
                         (
-                            word_id,
-                            sense_order,
-                            translation_chn,
-                            definition_eng,
-                            part_of_speech,
-                            original_input_text,
-                        ),
+                            sense_id,
+                            example_order,
+                            example_data.get("phrase_marker"),
+                            example_data.get("sentence_eng"),
+                            example_data.get("sentence_chn"),
+                            example_data.get("source", "original"),
+                        )
                     )
 
-                    sense_id = cursor.lastrowid
-
-                    for example_data in sense_data.get(
-                        "examples", []
-                    ):  # Handle missing 'examples' key
-                        example_order = example_data.get(
-                            "example_order", 0
-                        )  # Handle missing example_order
-                        phrase_marker = example_data.get("phrase_marker")
-                        sentence_eng = example_data.get("sentence_eng")
-                        sentence_chn = example_data.get("sentence_chn")
-                        example_source = example_data.get(
-                            "source", "original"
-                        )  # Default to "original"
-
-                        cursor.execute(
-                            """
-                            INSERT INTO examples (sense_id, example_order, phrase_marker, sentence_eng, sentence_chn, example_source)
-                            VALUES (?, ?, ?, ?, ?, ?)
-                        """,
-                            (
-                                sense_id,
-                                example_order,
-                                phrase_marker,
-                                sentence_eng,
-                                sentence_chn,
-                                example_source,
-                            ),
-                        )
+        cursor.executemany(
+            "UPDATE words SET short_translation_summary = ? WHERE id = ?",
+            summary_rows,
+        )
+        cursor.executemany(
+            """
+            INSERT INTO senses (sense_id, word_id, sense_order, translation_chn, definition_eng, part_of_speech, original_input_text)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+            sense_rows,
+        )
+        cursor.executemany(
+            """
+            INSERT INTO examples (sense_id, example_order, phrase_marker, sentence_eng, sentence_chn, example_source)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """,
+            example_rows,
+        )
+        self.words_written += len(written)
+        return len(summary_rows) + len(sense_rows) + len(example_rows), written
 
-                conn.commit()  # Commit after processing each word
-                print(
-                    f"Thread {threading.current_thread().name} Successfully processed and stored: {word}"
-                )
+    def _write_upsert(self, cursor, pending):
+        """
+        Diffs each word's new senses/examples against the stored rows keyed on
+        (word_id, sense_order) and (sense_id, example_order), then inserts,
+        updates or deletes only what changed. Returns the number of rows
+        touched and the words that were written.
+        """
+        words = {}
+        for row in self._select_in(
+            cursor,
+            "SELECT word, id, short_translation_summary FROM words WHERE word IN ({})",
+            {word for word, _ in pending},
+        ):
+            words[row[0]] = row[1:]
+        word_ids = [word_id for word_id, _ in words.values()]
 
-            except Exception as db_error:
-                print(
-                    f"Thread {threading.current_thread().name} Database Error for {word}: {db_error}"
+        stored_senses = {}  # (word_id, sense_order) -> (sense_id, fields)
+        for sense_id, word_id, sense_order, *fields in self._select_in(
+            cursor,
+            "SELECT sense_id, word_id, sense_order, translation_chn, definition_eng, "
+            "part_of_speech, original_input_text FROM senses WHERE word_id IN ({})",
+            word_ids,
+        ):
+            stored_senses[(word_id, sense_order)] = (sense_id, tuple(fields))
+
+        stored_examples = {}  # (sense_id, example_order) -> (example_id, fields)
+        for example_id, sense_id, example_order, *fields in self._select_in(
+            cursor,
+            "SELECT example_id, sense_id, example_order, phrase_marker, sentence_eng, "
+            "sentence_chn, example_source FROM examples WHERE sense_id IN ({})",
+            [sense_id for sense_id, _ in stored_senses.values()],
+        ):
+            stored_examples[(sense_id, example_order)] = (example_id, tuple(fields))
+
+        cursor.execute("SELECT COALESCE(MAX(sense_id), 0) FROM senses")
+        next_sense_id = cursor.fetchone()[0] + 1
+
+        summary_rows = []
+        sense_inserts, sense_updates, sense_deletes = [], [], []
+        example_inserts, example_updates, example_deletes = [], [], []
+        unchanged = 0
+        written = []
+
+        for word, data in dict(pending).items():  # Last result per word wins
+            if word not in words:
+                print(f"Writer Word not found in 'words' table: {word}")
+                continue
+            word_id, summary = words[word]
+            written.append(word)
+
+            new_summary = data.get("short_translation_summary")
+            if new_summary != summary:
+                summary_rows.append((new_summary, word_id))
+
+            senses = data.get("senses", [])
+            seen_senses = set()
+            for sense_order, sense_data in natural_order(senses, "sense_order"):
+                fields = (
+                    sense_data.get("translation_chn"),
+                    sense_data.get("definition_eng"),
+                    sense_data.get("part_of_speech"),
+                    sense_data.get("original_input_text"),
                 )
-                conn.rollback()  # Rollback on any error
+                stored = stored_senses.get((word_id, sense_order))
+                if stored is None:
+                    sense_id = next_sense_id
+                    next_sense_id += 1
+                    sense_inserts.append((sense_id, word_id, sense_order, *fields))
+                else:
+                    sense_id = stored[0]
+                    if stored[1] != fields:
+                        sense_updates.append((*fields, sense_id))
+                    else:
+                        unchanged += 1
+                seen_senses.add(sense_order)
 
-        finally:
-            conn.close()  # Always close the connection
-        queue.task_done()  # Signal the queue that the task is complete
+                seen_examples = set()
+                for example_order, example_data in natural_order(
+                    sense_data.get("examples", []), "example_order"
+                ):
+                    fields = (
+                        example_data.get("phrase_marker"),
+                        example_data.get("sentence_eng"),
+                        example_data.get("sentence_chn"),
+                        example_data.get("source", "original"),
+                    )
+                    stored = stored_examples.get((sense_id, example_order))
+                    if stored is None:
+                        example_inserts.append((sense_id, example_order, *fields))
+                    elif stored[1] != fields:
+                        example_updates.append((*fields, stored[0]))
+                    else:
+                        unchanged += 1
+                    seen_examples.add(example_order)
 
+                for (stored_sense_id, example_order), (example_id, _) in list(
+                    stored_examples.items()
+                ):
+                    if stored_sense_id == sense_id and example_order not in seen_examples:
+                        example_deletes.append((example_id,))
 
-# --- Data Processing and Insertion (Modified for Threading) ---
-def process_csv_threaded(csv_file, db_file, num_threads):
-    # --- Create a thread-safe queue ---
-    task_queue = queue.Queue()
+            for (stored_word_id, sense_order), (sense_id, _) in stored_senses.items():
+                if stored_word_id == word_id and sense_order not in seen_senses:
+                    sense_deletes.append((sense_id,))
+
+        # Foreign key cascades are off by default in SQLite, so delete examples explicitly
+        cursor.executemany("DELETE FROM examples WHERE sense_id = ?", sense_deletes)
+        cursor.executemany("DELETE FROM senses WHERE sense_id = ?", sense_deletes)
+        cursor.executemany("DELETE FROM examples WHERE example_id = ?", example_deletes)
+        cursor.executemany(
+            "UPDATE words SET short_translation_summary = ? WHERE id = ?",
+            summary_rows,
+        )
+        cursor.executemany(
+            """
+            INSERT INTO senses (sense_id, word_id, sense_order, translation_chn, definition_eng, part_of_speech, original_input_text)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+            sense_inserts,
+        )
+        cursor.executemany(
+            """
+            UPDATE senses SET translation_chn = ?, definition_eng = ?, part_of_speech = ?, original_input_text = ?
+            WHERE sense_id = ?
+        """,
+            sense_updates,
+        )
+        cursor.executemany(
+            """
+            INSERT INTO examples (sense_id, example_order, phrase_marker, sentence_eng, sentence_chn, example_source)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """,
+            example_inserts,
+        )
+        cursor.executemany(
+            """
+            UPDATE examples SET phrase_marker = ?, sentence_eng = ?, sentence_chn = ?, example_source = ?
+            WHERE example_id = ?
+        """,
+            example_updates,
+        )
+
+        self.words_written += len(written)
+        inserted = len(sense_inserts) + len(example_inserts)
+        updated = len(summary_rows) + len(sense_updates) + len(example_updates)
+        deleted = len(sense_deletes) + len(example_deletes)
+        print(
+            f"Writer upsert: {inserted} inserted, {updated} updated, "
+            f"{deleted} deleted, {unchanged} unchanged"
+        )
+        return inserted + updated + deleted, written
+
+
+# --- Resume Support ---
+class CheckpointJournal:
+    """
+    Append-only JSON-lines journal of every word the writer has committed,
+    including words whose result has no summary (and so don't show up in
+    load_enriched_words). A response that was received but never committed
+    before a crash is not journaled; the next run requests the word again,
+    which the LLM cache answers without another API call.
+
+    Only the words are recorded (the results are in the database), so
+    loading the journal costs one small set entry per word.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = None
+
+    def load(self):
+        """Returns the words on every complete line of an existing journal."""
+        words = set()
+        if not os.path.exists(self.path):
+            return words
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn final line from a crash
+                words.add(record["word"])  # Older journals also carry "data"
+        return words
+
+    def append(self, word):
+        line = json.dumps({"word": word}, ensure_ascii=False)
+        with self.lock:
+            if self.file is None:
+                torn = False
+                if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+                    with open(self.path, "rb") as existing:
+                        existing.seek(-1, os.SEEK_END)
+                        torn = existing.read(1) != b"\n"
+                self.file = open(self.path, "a", encoding="utf-8")
+                if torn:
+                    self.file.write("\n")  # Terminate a torn final line
+            self.file.write(line + "\n")
+            self.file.flush()
 
-    # --- Read the CSV and populate the queue ---
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def load_word_list(path):
+    """Reads one word per line, ignoring blank lines."""
+    with open(path, "r", encoding="utf-8") as file:
+        return {line.strip() for line in file if line.strip()}
+
+
+def load_enriched_words(db_file):
+    """Loads every word that already has a summary in a single table scan."""
+    conn = sqlite3.connect(db_file)
+    try:
+        cursor = conn.execute(
+            "SELECT word FROM words WHERE short_translation_summary IS NOT NULL "
+            "AND short_translation_summary != ''"
+        )
+        return {row[0] for row in cursor}
+    finally:
+        conn.close()
+
+
+def resume_from_checkpoint(db_file, journal, refresh_words=None):
+    """
+    Returns the set of words that must not be sent to the model again: the
+    enriched words in the database plus the journaled ones. Words in
+    `refresh_words` are always sent again.
+    """
+    done_words = load_enriched_words(db_file)
+    journaled = journal.load()
+    done_words.update(journaled)
+    if refresh_words:
+        done_words -= refresh_words
+    print(
+        f"Resume: {len(done_words)} words already done "
+        f"({len(journaled)} journaled in {journal.path})"
+    )
+    return done_words
+
+
+def read_pending_entries(csv_file, done_words, only_words=None):
+    """
+    Yields (word, description) rows of the CSV that still need enrichment,
+    restricted to `only_words` when it is given.
+    """
+    skipped = 0
     with open(csv_file, "r", encoding="utf-8") as file:
         reader = csv.reader(file)
         next(reader)  # Skip header row
@@ -325,38 +876,615 @@ def process_csv_threaded(csv_file, db_file, num_threads):
             if " " in word:  # Skip multi-word entries
                 print(f"Skipping multi-word entry: {word}")
                 continue
-            task_queue.put((word, description))
+            if word in done_words:
+                skipped += 1
+                continue
+            if only_words is not None and word not in only_words:
+                continue
+            yield word, description
 
-    # --- Initialize Google Generative AI model outside threads ---
-    model = initialize_genai()
+    print(f"Skipped {skipped} already enriched words")
+
+
+# --- Worker Function for Threading ---
+def record_response(metrics, response, full_prompt):
+    """Counts a completed request, estimating tokens the backend didn't report."""
+    metrics.inc("llm_requests")
+    metrics.inc("tokens_in", response.input_tokens or estimate_tokens(full_prompt))
+    metrics.inc("tokens_out", response.output_tokens or estimate_tokens(response.text))
+
+
+def fetch_response_text(model, cache, metrics, instructions, input_text, full_prompt):
+    """
+    Calls the LLM with retry, or replays the response from the cache. The
+    cache is keyed on the backend's cache_name and skipped if it has none.
+    """
+    cache_key = model.cache_name and make_cache_key(
+        model.cache_name, instructions, input_text
+    )
+    response_text = cache.get(cache_key) if cache_key else None
+    if response_text is None:
+        with metrics.time("llm_api"):
+            response = generate_content_with_retry(model, full_prompt)
+        record_response(metrics, response, full_prompt)
+        response_text = response.text
+        if cache_key:
+            cache.put(cache_key, response_text)
+    else:
+        metrics.inc("cache_hits")
+    return response_text
+
+
+def enrich_single_word(model, cache, metrics, word, description):
+    """Single-headword request. Returns the parsed JSON, or None on failure."""
+    name = threading.current_thread().name
+
+    # --- Call the LLM with Retry (or replay it from the cache) ---
+    try:
+        response_text = fetch_response_text(
+            model, cache, metrics, prompt, description, build_full_prompt(description)
+        )
+        if VERBOSE:
+            print(f"Thread {name} LLM response: {response_text}")  # Printing the raw response
+    except Exception as e:
+        print(f"Thread {name} LLM API Error after retry for {word}: {e}")
+        return None
+
+    # --- Extract, repair and validate the JSON ---
+    try:
+        return decode_enrichment(response_text, metrics)
+    except LLMJSONError as e:
+        metrics.inc("json_errors")
+        print(f"Thread {name} JSON Decode Error for {word}: {e}")
+        if VERBOSE:
+            print(f"Thread {name} Failing JSON String: {response_text}")
+        return None
+
+
+def enrich_batch(model, cache, metrics, batch):
+    """
+    One request for every headword in the batch. Returns {word: data} for the
+    words whose results parsed and validated.
+    """
+    name = threading.current_thread().name
+    input_text = build_batch_input(batch)
+    try:
+        response_text = fetch_response_text(
+            model, cache, metrics, batch_prompt, input_text, batch_prompt + input_text
+        )
+    except Exception as e:
+        print(f"Thread {name} LLM API Error after retry for batch of {len(batch)}: {e}")
+        return {}
+
+    with metrics.time("json_decode"):
+        results = parse_batch_response(response_text, [word for word, _ in batch])
+    if len(results) < len(batch):
+        metrics.inc("batch_fallbacks", len(batch) - len(results))
+        print(
+            f"Thread {name} Batch parsed {len(results)}/{len(batch)} words, "
+            "falling back to single-word requests for the rest"
+        )
+    return results
+
+
+def worker(queue, model, writer, cache, metrics):
+    while True:
+        item = queue.get()
+        if item is None:
+            break  # Sentinel value to signal thread to exit
+
+        enqueued_at, batch = item
+        metrics.observe("queue_wait", time.monotonic() - enqueued_at)
+
+        try:
+            if VERBOSE:
+                print(
+                    f"Thread {threading.current_thread().name} processing: "
+                    + ", ".join(word for word, _ in batch)
+                )
+
+            results = (
+                enrich_batch(model, cache, metrics, batch) if len(batch) > 1 else {}
+            )
+
+            for word, description in batch:
+                data = results.get(word)
+                if data is None:
+                    data = enrich_single_word(model, cache, metrics, word, description)
+                if data is None:
+                    metrics.inc("words_failed")
+                    continue  # skip to next word
+
+                # --- Hand it to the writer (which journals it once committed) ---
+                writer.submit(word, data)
+                metrics.inc("words_done")
+
+        finally:
+            queue.task_done()  # Signal the queue that the task is complete
+
+
+# --- Data Processing and Insertion (Modified for Threading) ---
+def process_csv_threaded(
+    csv_file,
+    db_file,
+    num_threads,
+    commit_every=WRITER_BATCH_SIZE,
+    commit_interval=WRITER_FLUSH_SECONDS,
+    journal_file=JOURNAL_FILE,
+    cache=None,
+    batch_size=1,
+    queue_depth=None,
+    backend_spec=None,
+    metrics=None,
+    upsert=False,
+    refresh_words=None,
+):
+    # --- Create a bounded thread-safe queue (the producer blocks when it is full) ---
+    task_queue = queue.Queue(maxsize=queue_depth or 2 * num_threads)
+
+    # --- Resume: skip everything already done ---
+    metrics = metrics or PipelineMetrics("enrich")
+    metrics.start()
+    journal = CheckpointJournal(journal_file)
+    done_words = resume_from_checkpoint(db_file, journal, refresh_words)
+    writer = EnrichmentWriter(
+        db_file, commit_every, commit_interval, metrics, upsert, journal
+    ).start()
+
+    # --- Initialize the LLM backend outside threads ---
+    model = initialize_backend(backend_spec)
+    cache = cache or LLMCache()
 
     # --- Create worker threads ---
     threads = []
     for i in range(num_threads):
         t = threading.Thread(
-            target=worker, args=(task_queue, model), name=f"Thread-{i + 1}"
+            target=worker,
+            args=(task_queue, model, writer, cache, metrics),
+            name=f"Thread-{i + 1}",
         )
         threads.append(t)
         t.daemon = True  # Allow main thread to exit even if workers are running
         t.start()
 
-    # --- Wait for all tasks to be done ---
-    task_queue.join()
-
-    # --- Signal the workers to exit ---
-    for i in range(num_threads):
-        task_queue.put(None)  # Add sentinel values to stop the workers
+    # --- Stream the CSV into the queue while the workers drain it ---
+    try:
+        pending = read_pending_entries(csv_file, done_words, refresh_words)
+        for batch in batched(pending, batch_size):
+            task_queue.put((time.monotonic(), batch))
+    finally:
+        # --- Signal the workers to exit once everything queued is done ---
+        for i in range(num_threads):
+            task_queue.put(None)  # Add sentinel values to stop the workers
 
     # --- Wait for all threads to finish ---
     for t in threads:
         t.join()
 
+    writer.close()
+    journal.close()
+    model.close()
+    metrics.close()
+    print(cache.stats())
     print("Threaded processing complete.")
 
 
+# --- Rate Limiting for the Async Engine ---
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` units per minute.
+
+    Used twice by the async engine: once counting requests and once counting
+    (estimated) LLM tokens. A limit of None or 0 disables the bucket. Only
+    safe to use from a single event loop.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute or 0
+        self.tokens = float(self.capacity)
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        if not self.capacity:
+            return
+        amount = min(amount, self.capacity)  # A single oversized request must still pass
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def debit(self, amount):
+        """Charges usage discovered after the fact (may drive the bucket negative)."""
+        if self.capacity:
+            self._refill()
+            self.tokens -= amount
+
+
+# --- Async Worker ---
+async def fetch_response_text_async(
+    model,
+    cache,
+    metrics,
+    instructions,
+    input_text,
+    full_prompt,
+    request_bucket,
+    token_bucket,
+    expected_outputs=1,
+):
+    """
+    Rate-limited async LLM call with retry, or a replay from the cache. The
+    cache's SQLite reads and commits run in a worker thread so they don't
+    stall the other requests on the event loop.
+    """
+    cache_key = model.cache_name and make_cache_key(
+        model.cache_name, instructions, input_text
+    )
+    response_text = await asyncio.to_thread(cache.get, cache_key) if cache_key else None
+    if response_text is not None:
+        metrics.inc("cache_hits")
+        return response_text
+
+    estimated_tokens = (
+        estimate_tokens(full_prompt) + EST_OUTPUT_TOKENS * expected_outputs
+    )
+    await request_bucket.acquire()
+    await token_bucket.acquire(estimated_tokens)
+
+    with metrics.time("llm_api"):
+        response = await generate_content_async_with_retry(model, full_prompt)
+    record_response(metrics, response, full_prompt)
+    response_text = response.text
+    if cache_key:
+        await asyncio.to_thread(cache.put, cache_key, response_text)
+
+    # Reconcile the token estimate with what the API actually reports
+    if response.total_tokens:
+        token_bucket.debit(response.total_tokens - estimated_tokens)
+    return response_text
+
+
+async def async_worker(
+    name,
+    task_queue,
+    model,
+    writer,
+    cache,
+    metrics,
+    request_bucket,
+    token_bucket,
+):
+    while True:
+        item = await task_queue.get()
+        if item is None:
+            task_queue.task_done()
+            break  # Sentinel value to signal the coroutine to exit
+
+        enqueued_at, batch = item
+        metrics.observe("queue_wait", time.monotonic() - enqueued_at)
+
+        try:
+            results = {}
+            if len(batch) > 1:
+                input_text = build_batch_input(batch)
+                try:
+                    response_text = await fetch_response_text_async(
+                        model,
+                        cache,
+                        metrics,
+                        batch_prompt,
+                        input_text,
+                        batch_prompt + input_text,
+                        request_bucket,
+                        token_bucket,
+                        expected_outputs=len(batch),
+                    )
+                    with metrics.time("json_decode"):
+                        results = parse_batch_response(
+                            response_text, [word for word, _ in batch]
+                        )
+                except Exception as e:
+                    print(f"{name} LLM API Error after retry for batch of {len(batch)}: {e}")
+                if len(results) < len(batch):
+                    metrics.inc("batch_fallbacks", len(batch) - len(results))
+                    print(
+                        f"{name} Batch parsed {len(results)}/{len(batch)} words, "
+                        "falling back to single-word requests for the rest"
+                    )
+
+            for word, description in batch:
+                data = results.get(word)
+                if data is None:
+                    try:
+                        response_text = await fetch_response_text_async(
+                            model,
+                            cache,
+                            metrics,
+                            prompt,
+                            description,
+                            build_full_prompt(description),
+                            request_bucket,
+                            token_bucket,
+                        )
+                    except Exception as e:
+                        print(f"{name} LLM API Error after retry for {word}: {e}")
+                        metrics.inc("words_failed")
+                        continue
+                    if VERBOSE:
+                        print(f"{name} LLM response: {response_text}")
+
+                    try:
+                        data = decode_enrichment(response_text, metrics)
+                    except LLMJSONError as e:
+                        print(f"{name} JSON Decode Error for {word}: {e}")
+                        if VERBOSE:
+                            print(f"{name} Failing JSON String: {response_text}")
+                        metrics.inc("json_errors")
+                        metrics.inc("words_failed")
+                        continue
+
+                writer.submit(word, data)
+                metrics.inc("words_done")
+
+        finally:
+            task_queue.task_done()
+
+
+# --- Data Processing and Insertion (Asyncio) ---
+async def process_csv_async(
+    csv_file,
+    db_file,
+    max_in_flight,
+    requests_per_minute,
+    tokens_per_minute,
+    commit_every=WRITER_BATCH_SIZE,
+    commit_interval=WRITER_FLUSH_SECONDS,
+    journal_file=JOURNAL_FILE,
+    cache=None,
+    batch_size=1,
+    queue_depth=None,
+    backend_spec=None,
+    metrics=None,
+    upsert=False,
+    refresh_words=None,
+):
+    """
+    Enriches the dictionary with a single event loop instead of one OS thread
+    per concurrent request. `max_in_flight` worker coroutines hand their
+    results to the writer thread; the buckets keep request and token rates
+    under the API quota. The CSV is streamed through a bounded queue, so
+    work starts with the first row and memory doesn't grow with the file.
+    """
+    task_queue = asyncio.Queue(maxsize=queue_depth or 2 * max_in_flight)
+
+    metrics = metrics or PipelineMetrics("enrich")
+    metrics.start()
+    journal = CheckpointJournal(journal_file)
+    done_words = resume_from_checkpoint(db_file, journal, refresh_words)
+    writer = EnrichmentWriter(
+        db_file, commit_every, commit_interval, metrics, upsert, journal
+    ).start()
+
+    model = initialize_backend(backend_spec)
+    cache = cache or LLMCache()
+    request_bucket = TokenBucket(requests_per_minute)
+    token_bucket = TokenBucket(tokens_per_minute)
+
+    try:
+        workers = [
+            asyncio.create_task(
+                async_worker(
+                    f"Task-{i + 1}",
+                    task_queue,
+                    model,
+                    writer,
+                    cache,
+                    metrics,
+                    request_bucket,
+                    token_bucket,
+                )
+            )
+            for i in range(max_in_flight)
+        ]
+
+        try:
+            pending = read_pending_entries(csv_file, done_words, refresh_words)
+            for batch in batched(pending, batch_size):
+                # Blocks while the workers are behind
+                await task_queue.put((time.monotonic(), batch))
+        finally:
+            for _ in workers:
+                await task_queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        writer.close()
+        journal.close()
+        model.close()
+        metrics.close()
+        print(cache.stats())
+
+    print("Async processing complete.")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Enrich dictionary entries with senses and examples using Gemini."
+    )
+    parser.add_argument("--csv", default=CSV_FILE, help="Input dictionary CSV")
+    parser.add_argument("--db", default=DB_FILE, help="SQLite database to enrich")
+    parser.add_argument(
+        "--mode",
+        choices=["threaded", "async"],
+        default="threaded",
+        help="Worker engine: one OS thread per request or a single asyncio loop",
+    )
+    parser.add_argument(
+        "--threads", type=int, default=NUM_THREADS, help="Threads (threaded mode)"
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=MAX_IN_FLIGHT,
+        help="Maximum concurrent LLM requests (async mode)",
+    )
+    parser.add_argument(
+        "--rpm",
+        type=int,
+        default=REQUESTS_PER_MINUTE,
+        help="Request rate limit per minute, 0 to disable (async mode)",
+    )
+    parser.add_argument(
+        "--tpm",
+        type=int,
+        default=TOKENS_PER_MINUTE,
+        help="Token rate limit per minute, 0 to disable (async mode)",
+    )
+    parser.add_argument(
+        "--commit-every",
+        type=int,
+        default=WRITER_BATCH_SIZE,
+        help="Words per writer transaction",
+    )
+    parser.add_argument(
+        "--commit-interval",
+        type=float,
+        default=WRITER_FLUSH_SECONDS,
+        help="Maximum seconds between writer commits",
+    )
+    parser.add_argument(
+        "--journal",
+        default=JOURNAL_FILE,
+        help="Append-only checkpoint journal of committed words",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the on-disk LLM response cache",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Headwords packed into one LLM request (1 disables batching)",
+    )
+    parser.add_argument(
+        "--queue-depth",
+        type=int,
+        default=None,
+        help="Batches buffered ahead of the workers (default: twice the worker count)",
+    )
+    parser.add_argument(
+        "--backend",
+        default=None,
+        help="LLM backend spec, e.g. gemini, mock:latency=0.2,error_rate=0.05, "
+        "replay:run.jsonl (default: $LLM_BACKEND or gemini)",
+    )
+    parser.add_argument(
+        "--metrics-jsonl",
+        default=METRICS_JSONL_FILE,
+        help="JSON-lines file that periodic metric snapshots are appended to",
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        default=METRICS_PROM_FILE,
+        help="Prometheus text-format file rewritten with every snapshot",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=METRICS_INTERVAL,
+        help="Seconds between metric snapshots",
+    )
+    parser.add_argument(
+        "--upsert",
+        action="store_true",
+        help="Diff results against stored senses/examples and write only changed rows",
+    )
+    parser.add_argument(
+        "--migrate-dry-run",
+        action="store_true",
+        help="Report what the --upsert natural key migration would remove or renumber, then exit",
+    )
+    parser.add_argument(
+        "--refresh",
+        default=None,
+        help=(
+            "File of words (one per line) to re-enrich even if already done; implies "
+            "--upsert. Cached responses are not reused but the new ones are cached"
+        ),
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Print every raw LLM response and each batch a worker picks up",
+    )
+    return parser.parse_args()
+
+
 # --- Main ---
 if __name__ == "__main__":
+    args = parse_args()
+    VERBOSE = args.verbose
+    metrics = PipelineMetrics(
+        "enrich", args.metrics_jsonl, args.metrics_prom, args.metrics_interval
+    )
     create_database_schema(
-        DB_FILE
+        args.db
     )  # Ensure the senses and examples table are created even if words already exist
-    process_csv_threaded(CSV_FILE, DB_FILE, NUM_THREADS)
+    refresh_words = load_word_list(args.refresh) if args.refresh else None
+    upsert = args.upsert or refresh_words is not None
+    if args.migrate_dry_run:
+        create_natural_key_indexes(args.db, dry_run=True)
+        sys.exit()
+    if args.no_cache:
+        cache = LLMCache(enabled=False)
+    elif refresh_words:
+        cache = LLMCache(refresh=True)  # Replaying the old responses would refresh nothing
+    else:
+        cache = None
+    if upsert:
+        create_natural_key_indexes(args.db)
+    if args.mode == "async":
+        asyncio.run(
+            process_csv_async(
+                args.csv,
+                args.db,
+                args.max_in_flight,
+                args.rpm,
+                args.tpm,
+                args.commit_every,
+                args.commit_interval,
+                args.journal,
+                cache,
+                args.batch_size,
+                args.queue_depth,
+                args.backend,
+                metrics,
+                upsert,
+                refresh_words,
+            )
+        )
+    else:
+        process_csv_threaded(
+            args.csv,
+            args.db,
+            args.threads,
+            args.commit_every,
+            args.commit_interval,
+            args.journal,
+            cache,
+            args.batch_size,
+            args.queue_depth,
+            args.backend,
+            metrics,
+            upsert,
+            refresh_words,
+        )
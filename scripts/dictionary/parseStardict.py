@@ -1,11 +1,43 @@
+import argparse
 import gzip
+import mmap
+import random
+import re
 import struct
 import sqlite3
 import sys
 import os
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 
+# A null-terminated headword followed by its 32-bit offset and size
+IDX_ENTRY_PATTERN = re.compile(rb"([^\0]*)\0(.{8})", re.DOTALL)
 
-def parse_stardict_dict_dz(dict_dz_path, db_path, ifo_path=None):
+DICTZIP_CACHE_CHUNKS = 64  # Decompressed chunks (usually ~58 KB each) kept in the LRU
+STREAM_BLOCK_SIZE = 1 << 20  # Bytes read and decompressed per step when streaming
+SHARD_BYTES = 4 << 20  # Uncompressed bytes per shard in the multiprocess mode
+DEFINITION_CACHE_SIZE = 1024  # Decoded definitions kept by StarDict
+SORTED_INDEX_SUFFIX = ".sorted"  # Sorted entry table written next to the .idx
+SORTED_INDEX_MAGIC = b"SDXSORT1"
+# Magic, byte order of the table, then the size, mtime and entry count of the .idx
+SORTED_INDEX_HEADER = struct.Struct("<8s1s7xQQQ")
+BULK_BATCH_SIZE = 5000  # Rows per executemany in the bulk-load mode
+BULK_PROGRESS_EVERY = 50000
+BULK_LOAD_PRAGMAS = {  # Only safe because the database is new; restored afterwards
+    "journal_mode": "OFF",
+    "synchronous": "OFF",
+    "cache_size": -262144,  # 256 MB
+}
+GZIP_FEXTRA, GZIP_FNAME, GZIP_FCOMMENT, GZIP_FHCRC = 0x04, 0x08, 0x10, 0x02
+
+
+def parse_stardict_dict_dz(
+    dict_dz_path, db_path, ifo_path=None, random_access=False, workers=1, bulk=False
+):
     """
     Parses a StarDict .dict.dz file and stores the word-definition pairs
     in an SQLite database. Correctly handles sametypesequence.
@@ -16,6 +48,14 @@ def parse_stardict_dict_dz(dict_dz_path, db_path, ifo_path=None):
         ifo_path: Optional path to the .ifo file. If provided,
                   sametypesequence is read from it. If not provided,
                   it is assumed sametypesequence is NOT used.
+        random_access: Read the entries in index order through the dictzip
+                  chunk table instead of streaming the file once in offset
+                  order.
+        workers: Number of processes that decompress and parse shards of
+                  the dictionary in parallel (1 disables multiprocessing).
+        bulk: Load with executemany and relaxed pragmas, index the table
+                  afterwards and report progress instead of every entry
+                  (see bulk_load_dictionary).
     """
 
     if os.path.exists(db_path):
@@ -45,6 +85,27 @@ def parse_stardict_dict_dz(dict_dz_path, db_path, ifo_path=None):
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
 
+        # Load the corresponding .idx file to get word offsets and sizes.
+        word_data = load_idx_mmap(find_idx_path(dict_dz_path))
+
+        debug = not bulk  # Bulk mode reports progress instead of every entry
+        if workers > 1:
+            definitions = iter_definitions_parallel(
+                dict_dz_path, word_data, sametypesequence, workers, debug
+            )
+        elif random_access:
+            entries = iter_entries_random_access(dict_dz_path, word_data)
+            definitions = iter_definitions(entries, sametypesequence, debug)
+        else:
+            entries = iter_entries_in_offset_order(dict_dz_path, word_data)
+            definitions = iter_definitions(entries, sametypesequence, debug)
+
+        if bulk:
+            entry_count = bulk_load_dictionary(conn, definitions, len(word_data))
+            print(f"Successfully parsed '{dict_dz_path}' and created '{db_path}'")
+            print(f"Total entries processed: {entry_count}")
+            return
+
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS dictionary (
                 word TEXT PRIMARY KEY,
@@ -53,54 +114,31 @@ def parse_stardict_dict_dz(dict_dz_path, db_path, ifo_path=None):
         """)
         conn.commit()
 
-        with gzip.open(dict_dz_path, "rb") as f:
-            # Load the corresponding .idx file to get word offsets and sizes.
-            idx_path = dict_dz_path[:-7] + "idx"  # Replace .dict.dz with .idx
-            if not os.path.exists(idx_path):
-                idx_path += ".gz"  # Try .idx.gz if .idx doesn't exist
-                if not os.path.exists(idx_path):
-                    raise FileNotFoundError(
-                        f"Could not find .idx or .idx.gz file for {dict_dz_path}"
-                    )
-
-            word_data = load_idx(idx_path)  # Load the index data
+        entry_count = 0
+        for word, definition, error in definitions:
+            print(f"DEBUG: Processing word: '{word}'")
+            if error is not None:
+                print(f"Error parsing entry for '{word}': {error}")
+                continue
 
-            entry_count = 0
-            for word, (offset, size) in word_data.items():
-                # Seek to the correct offset in the decompressed data
-                f.seek(offset)
-                entry_data = f.read(size)
-                print(
-                    f"DEBUG: Processing word: '{word}', offset: {offset}, size: {size}"
+            try:
+                cursor.execute(
+                    "INSERT INTO dictionary (word, definition) VALUES (?, ?)",
+                    (word, definition),
                 )
+                entry_count += 1
+                print(f"DEBUG: Successfully inserted '{word}'")
 
-                try:
-                    if sametypesequence:
-                        definition = parse_with_sametypesequence(
-                            entry_data, sametypesequence
-                        )
-                    else:
-                        definition = parse_without_sametypesequence(entry_data)
-
-                    cursor.execute(
-                        "INSERT INTO dictionary (word, definition) VALUES (?, ?)",
-                        (word, definition),
-                    )
-                    entry_count += 1
-                    print(f"DEBUG: Successfully inserted '{word}'")
-
-                except sqlite3.IntegrityError:
-                    print(f"Warning: Duplicate word '{word}' found. Skipping.")
-                except ValueError as e:
-                    print(f"Error parsing entry for '{word}': {e}")
-                except sqlite3.Error as e:
-                    print(f"SQLite error during insert: {e}")
-                    conn.rollback()
-                    raise
-
-            conn.commit()
-            print(f"Successfully parsed '{dict_dz_path}' and created '{db_path}'")
-            print(f"Total entries processed: {entry_count}")
+            except sqlite3.IntegrityError:
+                print(f"Warning: Duplicate word '{word}' found. Skipping.")
+            except sqlite3.Error as e:
+                print(f"SQLite error during insert: {e}")
+                conn.rollback()
+                raise
+
+        conn.commit()
+        print(f"Successfully parsed '{dict_dz_path}' and created '{db_path}'")
+        print(f"Total entries processed: {entry_count}")
 
     except FileNotFoundError:
         print(
@@ -122,6 +160,246 @@ def parse_stardict_dict_dz(dict_dz_path, db_path, ifo_path=None):
             conn.close()
 
 
+def find_idx_path(dict_path):
+    """Returns the .idx (or .idx.gz) file next to a .dict or .dict.dz file."""
+    base = dict_path[:-3] if dict_path.endswith(".dz") else dict_path
+    idx_path = base[:-4] + "idx"  # Replace .dict with .idx
+    if not os.path.exists(idx_path):
+        idx_path += ".gz"  # Try .idx.gz if .idx doesn't exist
+        if not os.path.exists(idx_path):
+            raise FileNotFoundError(f"Could not find .idx or .idx.gz file for {dict_path}")
+    return idx_path
+
+
+def iter_entries_random_access(dict_path, index):
+    """Yields (word, data) in index order, decompressing only the chunks each entry spans."""
+    with open_dict_data(dict_path) as f:
+        for word, offset, size in index:
+            yield word, f.read(offset, size)
+
+
+def iter_entries_in_offset_order(dict_path, index):
+    """
+    Yields (word, data) for every index entry in offset order while reading
+    and decompressing the dictionary exactly once from start to finish.
+
+    Only a sliding window is kept in memory: data before the next entry's
+    offset is dropped, and at most STREAM_BLOCK_SIZE bytes are decompressed
+    ahead of the entry being read.
+    """
+    offsets, sizes, words = index.offsets, index.sizes, index.words
+    order = sorted(range(len(index)), key=offsets.__getitem__)
+
+    with open(dict_path, "rb") as f:
+        decompressor = None
+        if dict_path.endswith(".dz") or dict_path.endswith(".gz"):
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)  # gzip wrapper
+        window = bytearray()
+        window_start = 0  # Offset in the uncompressed data of window[0]
+
+        for i in order:
+            offset = offsets[i]
+            end = offset + sizes[i]
+            while window_start + len(window) < end:
+                if decompressor is None:
+                    block = f.read(STREAM_BLOCK_SIZE)
+                elif decompressor.unconsumed_tail:
+                    block = decompressor.decompress(
+                        decompressor.unconsumed_tail, STREAM_BLOCK_SIZE
+                    )
+                else:
+                    compressed = f.read(STREAM_BLOCK_SIZE)
+                    block = compressed and decompressor.decompress(
+                        compressed, STREAM_BLOCK_SIZE
+                    )
+                if not block:
+                    raise ValueError(f"Entry '{words[i]}' extends past the end of the data")
+                window += block
+
+            if offset > window_start:
+                del window[: offset - window_start]  # Cheap: bytearray trims in place
+                window_start = offset
+            yield words[i], bytes(window[offset - window_start : end - window_start])
+
+
+def parse_entry(entry_data, sametypesequence, debug=True):
+    """Decodes one entry's data into its definition text."""
+    if sametypesequence:
+        return parse_with_sametypesequence(entry_data, sametypesequence)
+    return parse_without_sametypesequence(entry_data, debug)
+
+
+def iter_definitions(entries, sametypesequence, debug=True):
+    """Parses (word, data) pairs into (word, definition, error) triples."""
+    for word, entry_data in entries:
+        try:
+            yield word, parse_entry(entry_data, sametypesequence, debug), None
+        except ValueError as e:
+            yield word, None, str(e)
+
+
+def shard_index(index, shard_bytes):
+    """
+    Splits the index, sorted by offset, into contiguous shards covering
+    `shard_bytes` of uncompressed data each (by entry start offset).
+
+    Returns:
+        A list of (words, offsets, sizes) tuples in offset order.
+    """
+    offsets, sizes, words = index.offsets, index.sizes, index.words
+    order = sorted(range(len(index)), key=offsets.__getitem__)
+
+    shards = []
+    current = None
+    for i in order:
+        shard = offsets[i] // shard_bytes
+        if shard != current:
+            shards.append(([], array("I"), array("I")))
+            current = shard
+        shard_words, shard_offsets, shard_sizes = shards[-1]
+        shard_words.append(words[i])
+        shard_offsets.append(offsets[i])
+        shard_sizes.append(sizes[i])
+    return shards
+
+
+def extract_shard(dict_path, sametypesequence, words, offsets, sizes, debug=True):
+    """
+    Worker for iter_definitions_parallel: reads and parses one shard.
+    Only the dictzip chunks the shard spans are decompressed, each once,
+    since the entries arrive in offset order.
+    """
+    with open_dict_data(dict_path) as f:
+        entries = (
+            (word, f.read(offset, size))
+            for word, offset, size in zip(words, offsets, sizes)
+        )
+        return list(iter_definitions(entries, sametypesequence, debug))
+
+
+def iter_definitions_parallel(dict_path, index, sametypesequence, workers, debug=True):
+    """
+    Yields (word, definition, error) in offset order while `workers`
+    processes extract shards aligned to dictzip chunk ranges. Only a bounded
+    number of shards is in flight, so results stream to the caller (the
+    single SQLite writer) instead of piling up.
+    """
+    try:
+        with open_dict_data(dict_path) as f:
+            chunk_length = getattr(f, "chunk_length", None)
+            if chunk_length is None and not isinstance(f.data, mmap.mmap):
+                raise gzip.BadGzipFile  # Each worker would decompress the whole file
+    except gzip.BadGzipFile:
+        print("Warning: no dictzip chunk table; extracting in a single process.")
+        entries = iter_entries_in_offset_order(dict_path, index)
+        yield from iter_definitions(entries, sametypesequence, debug)
+        return
+
+    chunk_length = chunk_length or SHARD_BYTES
+    shard_bytes = chunk_length * max(1, SHARD_BYTES // chunk_length)
+    shards = shard_index(index, shard_bytes)
+    print(f"Extracting {len(shards)} shards with {workers} processes")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for words, offsets, sizes in shards:
+            pending.append(
+                executor.submit(
+                    extract_shard,
+                    dict_path,
+                    sametypesequence,
+                    words,
+                    offsets,
+                    sizes,
+                    debug,
+                )
+            )
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def bulk_load_dictionary(conn, definitions, total):
+    """
+    Fast load of (word, definition, error) triples into a new `dictionary`
+    table.
+
+    Rows go in with executemany in batches of BULK_BATCH_SIZE while the
+    BULK_LOAD_PRAGMAS are in effect (the previous values are restored
+    afterwards). The table has no PRIMARY KEY during the load; duplicates
+    are removed afterwards, keeping the first occurrence, and the word
+    index is built once at the end. Progress, parse errors and duplicates
+    are reported as counts.
+
+    Returns:
+        The number of entries in the table.
+    """
+    cursor = conn.cursor()
+    saved_pragmas = {
+        pragma: cursor.execute(f"PRAGMA {pragma}").fetchone()[0]
+        for pragma in BULK_LOAD_PRAGMAS
+    }
+    for pragma, value in BULK_LOAD_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma} = {value}")
+
+    try:
+        cursor.execute("CREATE TABLE dictionary (word TEXT, definition TEXT)")
+
+        loaded = 0
+        parse_errors = []
+        batch = []
+        start = time.perf_counter()
+        for word, definition, error in definitions:
+            if error is not None:
+                parse_errors.append((word, error))
+                continue
+            batch.append((word, definition))
+            if len(batch) >= BULK_BATCH_SIZE:
+                cursor.executemany(
+                    "INSERT INTO dictionary (word, definition) VALUES (?, ?)", batch
+                )
+                loaded += len(batch)
+                batch.clear()
+                if loaded % BULK_PROGRESS_EVERY < BULK_BATCH_SIZE:
+                    rate = loaded / max(time.perf_counter() - start, 1e-9)
+                    print(f"Loaded {loaded}/{total} entries ({rate:.0f}/s)")
+        cursor.executemany(
+            "INSERT INTO dictionary (word, definition) VALUES (?, ?)", batch
+        )
+        loaded += len(batch)
+
+        duplicates = cursor.execute(
+            "SELECT word, COUNT(*) - 1 FROM dictionary GROUP BY word HAVING COUNT(*) > 1"
+        ).fetchall()
+        if duplicates:
+            cursor.execute(
+                "DELETE FROM dictionary WHERE rowid NOT IN "
+                "(SELECT MIN(rowid) FROM dictionary GROUP BY word)"
+            )
+        print("Building word index...")
+        cursor.execute("CREATE UNIQUE INDEX idx_dictionary_word ON dictionary (word)")
+        conn.commit()
+    finally:
+        for pragma, value in saved_pragmas.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+
+    elapsed = time.perf_counter() - start
+    print(f"Loaded {loaded} entries in {elapsed:.1f}s ({loaded / max(elapsed, 1e-9):.0f}/s)")
+    if duplicates:
+        skipped = sum(count for _, count in duplicates)
+        sample = ", ".join(f"'{word}'" for word, _ in duplicates[:10])
+        print(
+            f"Warning: skipped {skipped} duplicate entries of {len(duplicates)} "
+            f"words, e.g. {sample}"
+        )
+    if parse_errors:
+        print(f"Warning: {len(parse_errors)} entries could not be parsed, e.g.:")
+        for word, error in parse_errors[:10]:
+            print(f"  '{word}': {error}")
+    return loaded - sum(count for _, count in duplicates)
+
+
 def load_idx(idx_path):
     """Loads the .idx or .idx.gz file and returns a dictionary
     mapping words to (offset, size) tuples."""
@@ -164,12 +442,504 @@ def load_idx(idx_path):
     return word_data
 
 
+class StarDictIndex:
+    """
+    Parsed .idx file: the headwords in file order plus parallel arrays of
+    their offsets and sizes in the .dict data. Iterating yields
+    (word, offset, size). Unlike the dict returned by load_idx, duplicate
+    headwords are kept.
+    """
+
+    def __init__(self, words, offsets, sizes):
+        self.words = words
+        self.offsets = offsets
+        self.sizes = sizes
+
+    def __len__(self):
+        return len(self.words)
+
+    def __iter__(self):
+        return zip(self.words, self.offsets, self.sizes)
+
+
+def load_idx_mmap(idx_path):
+    """
+    Loads a .idx file by memory-mapping it (or a .idx.gz file by
+    decompressing it once) and walking the entries in a single pass.
+
+    Returns:
+        A StarDictIndex.
+    """
+    try:
+        if idx_path.endswith(".gz"):
+            with gzip.open(idx_path, "rb") as f:
+                return _walk_idx(f.read())
+
+        with open(idx_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:  # mmap can't map an empty file
+                return _walk_idx(b"")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                return _walk_idx(buffer)
+    except OSError as e:
+        raise ValueError(f"Error reading or parsing .idx file: {e}")
+
+
+def _walk_idx(buffer):
+    # One C-level regex pass finds every entry; the 8-byte tails are then
+    # converted to offsets and sizes in bulk rather than one unpack per entry
+    entries = IDX_ENTRY_PATTERN.findall(buffer)
+    words = [word.decode("utf-8", errors="replace") for word, _ in entries]
+
+    tails = array("I")  # 4 bytes per value instead of a tuple of two ints
+    tails.frombytes(b"".join([tail for _, tail in entries]))
+    if sys.byteorder == "little":
+        tails.byteswap()  # The .idx stores them big-endian
+
+    return StarDictIndex(words, tails[0::2], tails[1::2])
+
+
+def _map_idx(idx_path):
+    """
+    Returns the raw bytes of a .idx file: memory-mapped, or decompressed
+    once for a .idx.gz. Entry positions in the result are positions in the
+    (uncompressed) .idx.
+    """
+    if idx_path.endswith(".gz"):
+        with gzip.open(idx_path, "rb") as f:
+            return f.read()
+    with open(idx_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:  # mmap can't map an empty file
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def build_sorted_index(buffer):
+    """
+    Returns the start positions of the .idx entries in `buffer` sorted by
+    headword bytes (the order of the decoded words for valid UTF-8), ties
+    in file order.
+    """
+    entries = sorted(
+        (match.group(1), match.start()) for match in IDX_ENTRY_PATTERN.finditer(buffer)
+    )
+    return array("I", [position for _, position in entries])
+
+
+def load_sorted_index(idx_path, buffer):
+    """
+    Returns the sorted entry table of `idx_path`, memory-mapped from the
+    SORTED_INDEX_SUFFIX file next to it. The table is built and saved there
+    when it is missing or the .idx has changed since; if it can't be saved
+    the built table is used from memory.
+
+    Returns:
+        (positions, mapping): a sequence of entry positions, and the mmap it
+        lives in (None when it is in memory) to close once done.
+    """
+    stat = os.stat(idx_path)
+    byteorder = sys.byteorder[0].encode()
+    sorted_path = idx_path + SORTED_INDEX_SUFFIX
+    try:
+        with open(sorted_path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, order, size, mtime, count = SORTED_INDEX_HEADER.unpack_from(mapping)
+        if (magic, order, size, mtime) == (
+            SORTED_INDEX_MAGIC,
+            byteorder,
+            stat.st_size,
+            stat.st_mtime_ns,
+        ) and len(mapping) == SORTED_INDEX_HEADER.size + 4 * count:
+            return memoryview(mapping)[SORTED_INDEX_HEADER.size :].cast("I"), mapping
+        mapping.close()
+    except (OSError, ValueError, struct.error):
+        pass  # Missing, empty or truncated: rebuild
+
+    positions = build_sorted_index(buffer)
+    try:
+        temporary_path = f"{sorted_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(
+                SORTED_INDEX_HEADER.pack(
+                    SORTED_INDEX_MAGIC,
+                    byteorder,
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    len(positions),
+                )
+            )
+            positions.tofile(f)
+        os.replace(temporary_path, sorted_path)
+    except OSError as e:
+        print(f"Could not save the sorted index to {sorted_path}: {e}")
+    return positions, None
+
+
+class DictzipReader:
+    """
+    Random access into a dictzip (.dict.dz) file.
+
+    dictzip compresses the data in independent chunks of a fixed
+    uncompressed length and records their compressed sizes in the "RA"
+    extra field of the gzip header. `read(offset, size)` decompresses only
+    the chunks the range spans, and the most recently used
+    `cache_chunks` chunks are kept decompressed, so a lookup costs one
+    chunk instead of re-decompressing the file up to the offset.
+
+    Raises:
+        gzip.BadGzipFile: if the file is not gzip or has no chunk table.
+    """
+
+    def __init__(self, path, cache_chunks=DICTZIP_CACHE_CHUNKS):
+        self.path = path
+        self.cache_chunks = cache_chunks
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()  # seek + read must not interleave
+        self.file = open(path, "rb")
+        try:
+            self._read_header()
+        except Exception:
+            self.file.close()
+            raise
+
+    def _read_header(self):
+        header = self.file.read(10)
+        if len(header) < 10 or header[:3] != b"\x1f\x8b\x08":
+            raise gzip.BadGzipFile(f"'{self.path}' is not a gzip file")
+        flags = header[3]
+        if not flags & GZIP_FEXTRA:
+            raise gzip.BadGzipFile(f"'{self.path}' has no dictzip chunk table")
+
+        extra_length = struct.unpack("<H", self.file.read(2))[0]
+        extra = self.file.read(extra_length)
+        table = None
+        position = 0
+        while position + 4 <= len(extra):  # Subfields: 2-byte id, 2-byte length
+            sub_length = struct.unpack_from("<H", extra, position + 2)[0]
+            if extra[position : position + 2] == b"RA":
+                table = extra[position + 4 : position + 4 + sub_length]
+            position += 4 + sub_length
+        if table is None:
+            raise gzip.BadGzipFile(f"'{self.path}' has no dictzip chunk table")
+
+        _, self.chunk_length, chunk_count = struct.unpack_from("<HHH", table)
+        compressed_sizes = struct.unpack_from(f"<{chunk_count}H", table, 6)
+
+        for flag in (GZIP_FNAME, GZIP_FCOMMENT):  # Null-terminated strings
+            if flags & flag:
+                while self.file.read(1) not in (b"\0", b""):
+                    pass
+        if flags & GZIP_FHCRC:
+            self.file.read(2)
+
+        # File offset of every chunk, plus the end of the last one
+        self.chunk_offsets = array("Q", [self.file.tell()])
+        for compressed_size in compressed_sizes:
+            self.chunk_offsets.append(self.chunk_offsets[-1] + compressed_size)
+
+    def _chunk(self, index):
+        chunk = self.cache.get(index)
+        if chunk is not None:
+            self.cache.move_to_end(index)
+            return chunk
+        if index >= len(self.chunk_offsets) - 1:
+            raise ValueError(f"Offset beyond the end of '{self.path}'")
+
+        start = self.chunk_offsets[index]
+        self.file.seek(start)
+        compressed = self.file.read(self.chunk_offsets[index + 1] - start)
+        chunk = zlib.decompressobj(-zlib.MAX_WBITS).decompress(compressed)
+
+        self.cache[index] = chunk
+        if len(self.cache) > self.cache_chunks:
+            self.cache.popitem(last=False)
+        return chunk
+
+    def read(self, offset, size):
+        """Returns `size` bytes of the uncompressed data starting at `offset`."""
+        first = offset // self.chunk_length
+        last = (offset + max(size, 1) - 1) // self.chunk_length
+        with self.lock:
+            chunks = [self._chunk(index) for index in range(first, last + 1)]
+        data = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+        start = offset - first * self.chunk_length
+        return data[start : start + size]
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class DictData:
+    """
+    Fallback for dictionaries that are not dictzip: a plain .dict file is
+    memory-mapped and a plain gzip file is decompressed once into memory.
+    Has the same read(offset, size) interface as DictzipReader.
+    """
+
+    def __init__(self, path):
+        self.file = None
+        if path.endswith(".dz") or path.endswith(".gz"):
+            with gzip.open(path, "rb") as f:
+                self.data = f.read()
+        else:
+            self.file = open(path, "rb")
+            if os.fstat(self.file.fileno()).st_size == 0:
+                self.data = b""
+            else:
+                self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, offset, size):
+        return self.data[offset : offset + size]
+
+    def close(self):
+        if self.file is not None:
+            if isinstance(self.data, mmap.mmap):
+                self.data.close()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_dict_data(dict_path, cache_chunks=DICTZIP_CACHE_CHUNKS):
+    """
+    Opens a .dict or .dict.dz file for random access, using the dictzip
+    chunk table when the file has one.
+    """
+    if dict_path.endswith(".dz"):
+        try:
+            return DictzipReader(dict_path, cache_chunks)
+        except gzip.BadGzipFile:
+            pass  # Plain gzip; the fallback below raises if it isn't gzip at all
+    return DictData(dict_path)
+
+
+def read_ifo(ifo_path):
+    """Returns the key=value lines of a .ifo file as a dict."""
+    info = {}
+    with open(ifo_path, "r", encoding="utf-8") as ifo_file:
+        for line in ifo_file:
+            key, separator, value = line.strip().partition("=")
+            if separator:
+                info[key] = value
+    return info
+
+
+class StarDict:
+    """
+    Queries a StarDict dictionary in place, without converting it to SQLite.
+
+    Nothing is read until the first query: then the .idx is memory-mapped
+    together with its sorted entry table (see load_sorted_index, built and
+    saved on the first open only), which exact lookups, prefix and range
+    queries binary-search in place, so opening doesn't decode the index.
+    The .dict.dz is opened for random access through its dictzip chunk
+    table. Decoded definitions are kept in an LRU of `cache_size` entries.
+    Words are compared exactly (case-sensitive); for duplicate headwords
+    the first in the .idx wins.
+
+    Args:
+        ifo_path: Path to the .ifo file; the .idx and .dict(.dz) files are
+                  expected next to it.
+        cache_size: Number of decoded definitions to keep.
+    """
+
+    def __init__(self, ifo_path, cache_size=DEFINITION_CACHE_SIZE):
+        self.ifo_path = ifo_path
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self._info = None
+        self._idx = None
+        self._positions = None
+        self._positions_mapping = None
+        self._data = None
+
+    @property
+    def info(self):
+        if self._info is None:
+            self._info = read_ifo(self.ifo_path)
+        return self._info
+
+    def _dict_path(self):
+        base = self.ifo_path[:-4]  # Strip .ifo
+        for candidate in (base + ".dict.dz", base + ".dict"):
+            if os.path.exists(candidate):
+                return candidate
+        raise FileNotFoundError(f"Could not find .dict or .dict.dz file for {self.ifo_path}")
+
+    def _load(self):
+        with self.lock:
+            if self._positions is not None:
+                return
+            idx_path = find_idx_path(self.ifo_path[:-4] + ".dict")
+            try:
+                self._idx = _map_idx(idx_path)
+                self._positions, self._positions_mapping = load_sorted_index(
+                    idx_path, self._idx
+                )
+            except OSError as e:
+                raise ValueError(f"Error reading or parsing .idx file: {e}")
+
+    def _key(self, rank):
+        """Headword bytes of the entry at `rank` in sorted order."""
+        position = self._positions[rank]
+        return self._idx[position : self._idx.find(b"\0", position)]
+
+    def _bisect(self, key, low=0):
+        """First rank whose headword is not below `key`."""
+        high = len(self._positions)
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _find(self, word):
+        """Rank of `word`, or None if it is not in the dictionary."""
+        self._load()
+        key = word.encode("utf-8")
+        rank = self._bisect(key)
+        if rank < len(self._positions) and self._key(rank) == key:
+            return rank
+        return None
+
+    def _words(self, low, high, limit):
+        if limit is not None:
+            high = min(high, low + limit)
+        return [
+            self._key(rank).decode("utf-8", errors="replace") for rank in range(low, high)
+        ]
+
+    def __len__(self):
+        self._load()
+        return len(self._positions)
+
+    def __contains__(self, word):
+        return self._find(word) is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def lookup(self, word):
+        """Returns the definition of `word`, or None if it is not in the dictionary."""
+        with self.lock:
+            definition = self.cache.get(word)
+            if definition is not None:
+                self.cache.move_to_end(word)
+                return definition
+
+        rank = self._find(word)
+        if rank is None:
+            return None
+
+        position = self._positions[rank]
+        offset, size = struct.unpack_from(
+            ">II", self._idx, self._idx.find(b"\0", position) + 1
+        )
+        with self.lock:
+            if self._data is None:
+                self._data = open_dict_data(self._dict_path())
+            entry_data = self._data.read(offset, size)
+        definition = parse_entry(entry_data, self.info.get("sametypesequence", ""), False)
+
+        with self.lock:
+            self.cache[word] = definition
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return definition
+
+    def range(self, start, end=None, limit=None):
+        """Returns the headwords w with start <= w < end in sorted order."""
+        self._load()
+        low = self._bisect(start.encode("utf-8"))
+        high = len(self._positions) if end is None else self._bisect(end.encode("utf-8"), low)
+        return self._words(low, max(low, high), limit)
+
+    def prefix(self, prefix, limit=None):
+        """Returns the headwords starting with `prefix` (for autocomplete)."""
+        self._load()
+        key = prefix.encode("utf-8")
+        low = self._bisect(key)
+        # Every headword with the prefix sorts before prefix + 0xff (never in UTF-8)
+        high = self._bisect(key + b"\xff", low)
+        return self._words(low, high, limit)
+
+    def close(self):
+        with self.lock:
+            if self._data is not None:
+                self._data.close()
+                self._data = None
+            if self._positions is not None:
+                if self._positions_mapping is not None:
+                    self._positions.release()  # Exported views block mmap.close()
+                    self._positions_mapping.close()
+                if isinstance(self._idx, mmap.mmap):
+                    self._idx.close()
+                self._idx = self._positions = self._positions_mapping = None
+
+
+def benchmark_dict_readers(dict_dz_path, lookups=100):
+    """Times random single-entry lookups with gzip seeks against DictzipReader."""
+    index = list(load_idx_mmap(find_idx_path(dict_dz_path)))
+    sample = random.Random(0).sample(index, min(lookups, len(index)))
+
+    start = time.perf_counter()
+    with gzip.open(dict_dz_path, "rb") as f:
+        expected = []
+        for _, offset, size in sample:
+            f.seek(offset)
+            expected.append(f.read(size))
+    gzip_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with DictzipReader(dict_dz_path) as reader:
+        actual = [reader.read(offset, size) for _, offset, size in sample]
+    dictzip_time = time.perf_counter() - start
+
+    print(f"gzip seek      {gzip_time / len(sample) * 1000:>10.2f} ms/lookup")
+    print(f"DictzipReader  {dictzip_time / len(sample) * 1000:>10.2f} ms/lookup")
+    print("Results match" if expected == actual else "Results DIFFER")
+
+
+def benchmark_idx_loaders(idx_path, repeat=3):
+    """Times load_idx against load_idx_mmap on `idx_path` and checks they agree."""
+    for name, loader in (("load_idx", load_idx), ("load_idx_mmap", load_idx_mmap)):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = loader(idx_path)
+            best = min(best, time.perf_counter() - start)
+        print(f"{name:<16}{best * 1000:>10.1f} ms  ({len(result)} entries)")
+
+    legacy = load_idx(idx_path)
+    fast = {word: (offset, size) for word, offset, size in load_idx_mmap(idx_path)}
+    print("Results match" if legacy == fast else "Results DIFFER")
+
+
 def parse_with_sametypesequence(data, sequence):
     """Parses a data entry assuming sametypesequence is used."""
     result = ""
     offset = 0
-    for type_char in sequence:
-        if type_char.islower():  # Null-terminated
+    for position, type_char in enumerate(sequence):
+        if position == len(sequence) - 1:
+            # The last field has no terminator or size; it runs to the end
+            decoded = data[offset:].decode("utf-8", errors="replace")
+        elif type_char.islower():  # Null-terminated
             end = data.find(b"\0", offset)
             if end == -1:
                 raise ValueError(f"Missing null terminator for type '{type_char}'")
@@ -190,7 +960,7 @@ def parse_with_sametypesequence(data, sequence):
     return result.strip()
 
 
-def parse_without_sametypesequence(data):
+def parse_without_sametypesequence(data, debug=True):
     """Parses a data entry assuming sametypesequence is NOT used."""
     result = ""
     offset = 0
@@ -198,7 +968,8 @@ def parse_without_sametypesequence(data):
         type_char = chr(data[offset])  # Correctly get the type character
         offset += 1
 
-        print(f"  DEBUG: Parsing type: '{type_char}'")  # Debug: Show the type char
+        if debug:
+            print(f"  DEBUG: Parsing type: '{type_char}'")  # Debug: Show the type char
 
         if type_char.islower():  # Null-terminated
             end = data.find(b"\0", offset)
@@ -209,7 +980,8 @@ def parse_without_sametypesequence(data):
             except UnicodeDecodeError:
                 decoded = f"(Decoding Error: Invalid UTF-8 at offset {offset})"  # Handles decoding error gracefully
             offset = end + 1
-            print(f"    DEBUG: Decoded (null-terminated): '{decoded}'")  # Debug
+            if debug:
+                print(f"    DEBUG: Decoded (null-terminated): '{decoded}'")  # Debug
 
         elif type_char.isupper():  # Correct to check for uppercase
             # Size-prefixed
@@ -225,9 +997,10 @@ def parse_without_sametypesequence(data):
             except UnicodeDecodeError:
                 decoded = f"(Decoding Error: Invalid UTF-8 at offset {offset})"  # Handles decoding error gracefully
             offset += size
-            print(
-                f"    DEBUG: Decoded (size-prefixed, size={size}): '{decoded}'"
-            )  # Debug
+            if debug:
+                print(
+                    f"    DEBUG: Decoded (size-prefixed, size={size}): '{decoded}'"
+                )  # Debug
 
         else:
             raise ValueError(
@@ -239,15 +1012,71 @@ def parse_without_sametypesequence(data):
     return result.strip()
 
 
-if __name__ == "__main__":
-    if len(sys.argv) < 3 or len(sys.argv) > 4:
-        print(
-            "Usage: python script.py <path_to_dict.dz> <path_to_output.db> [path_to_ifo]"
-        )
-        sys.exit(1)
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Convert a StarDict dictionary into an SQLite database."
+    )
+    parser.add_argument("dict_dz", nargs="?", help="Path to the .dict.dz (or .dict) file")
+    parser.add_argument("db", nargs="?", help="Path to the output SQLite database")
+    parser.add_argument("ifo", nargs="?", help="Optional .ifo file for sametypesequence")
+    parser.add_argument(
+        "--random-access",
+        action="store_true",
+        help="Read entries in index order through the dictzip chunk table "
+        "instead of one streaming pass in offset order",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes that extract dictzip chunk ranges in parallel",
+    )
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help="Bulk-load with executemany and relaxed pragmas, printing progress "
+        "instead of every entry",
+    )
+    parser.add_argument(
+        "--lookup",
+        nargs=2,
+        metavar=("IFO", "WORD"),
+        help="Look a word up in place (or list words with that prefix) and exit",
+    )
+    parser.add_argument(
+        "--benchmark-idx", metavar="IDX", help="Compare the .idx loaders and exit"
+    )
+    parser.add_argument(
+        "--benchmark-dz", metavar="DICT_DZ", help="Compare .dict.dz lookups and exit"
+    )
+    args = parser.parse_args()
+    if not (args.lookup or args.benchmark_idx or args.benchmark_dz) and not (args.dict_dz and args.db):
+        parser.error("the .dict.dz and output database paths are required")
+    return args
 
-    dict_dz_file = sys.argv[1]
-    sqlite_db_file = sys.argv[2]
-    ifo_file = sys.argv[3] if len(sys.argv) == 4 else None
-    parse_stardict_dict_dz(dict_dz_file, sqlite_db_file, ifo_file)
 
+if __name__ == "__main__":
+    args = parse_args()
+    if args.lookup:
+        ifo_path, word = args.lookup
+        with StarDict(ifo_path) as dictionary:
+            definition = dictionary.lookup(word)
+            if definition is not None:
+                print(definition)
+            else:
+                print(f"'{word}' not found. Words starting with it:")
+                for match in dictionary.prefix(word, limit=20):
+                    print(f"  {match}")
+    elif args.benchmark_idx:
+        benchmark_idx_loaders(args.benchmark_idx)
+    elif args.benchmark_dz:
+        benchmark_dict_readers(args.benchmark_dz)
+    else:
+        parse_stardict_dict_dz(
+            args.dict_dz,
+            args.db,
+            args.ifo,
+            args.random_access,
+            args.workers,
+            args.bulk,
+        )
@@ -0,0 +1,462 @@
+import argparse
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# --- Configuration ---
+DB_FILE = "vocabulary.db"
+WORD_LIST_FILE = "toefl_word_list.txt"
+MAX_EDIT_DISTANCE = 2  # Spelling neighbours ("adapt" -> "adopt", "adept")
+AFFIX_LENGTHS = (4, 3)  # Shared prefix/suffix lengths that count as an affix
+MAX_BUCKET_SIZE = 400  # Affix and gloss buckets larger than this carry no signal
+SYNONYM_OVERLAP = 0.6  # Gloss overlap above which a word could also be correct
+RANKED_CANDIDATES = 20  # Candidates kept per word
+WRITE_BATCH_SIZE = 500  # Questions per UPDATE transaction in regenerate mode
+
+# --- Scoring Weights ---
+EDIT_WEIGHTS = {1: 3.0, 2: 2.0}  # By edit distance
+SUFFIX_WEIGHT = 1.0
+PREFIX_WEIGHT = 0.5
+POS_WEIGHT = 2.0
+GLOSS_WEIGHT = 3.0
+LENGTH_PENALTY = 0.1  # Per character of length difference
+
+# --- Precompiled Patterns ---
+POS_MARKER = re.compile(r"\b(n|vt|vi|v|adj|adv|a|prep|conj|pron)\.")
+SYNONYMS = re.compile(r"\[同\]([^;\[]*)")
+CJK_RUN = re.compile(r"[一-鿿]+")
+ENGLISH_WORD = re.compile(r"[a-z]{4,}")
+HEADWORD = re.compile(r"[A-Za-z][A-Za-z' -]*")  # Skips malformed list entries
+
+POS_NAMES = {
+    "n": "noun",
+    "noun": "noun",
+    "v": "verb",
+    "vt": "verb",
+    "vi": "verb",
+    "verb": "verb",
+    "a": "adj",
+    "adj": "adj",
+    "adjective": "adj",
+    "adv": "adv",
+    "adverb": "adv",
+    "prep": "prep",
+    "preposition": "prep",
+    "conj": "conj",
+    "conjunction": "conj",
+    "pron": "pron",
+    "pronoun": "pron",
+}
+STOPWORDS = {
+    "that",
+    "this",
+    "with",
+    "from",
+    "which",
+    "something",
+    "someone",
+    "somebody",
+    "used",
+    "when",
+    "have",
+    "being",
+    "very",
+    "into",
+    "make",
+    "their",
+}
+
+
+# --- Vocabulary Loading ---
+def normalize_pos(part_of_speech):
+    """Maps "vt.", "Noun", "phrasal verb", ... to noun/verb/adj/adv/...."""
+    for token in re.findall(r"[a-z]+", (part_of_speech or "").lower()):
+        if token in POS_NAMES:
+            return POS_NAMES[token]
+    return None
+
+
+def gloss_tokens(text):
+    """Chinese character bigrams and content words of a gloss or definition."""
+    tokens = set()
+    for run in CJK_RUN.findall(text or ""):
+        if len(run) == 1:
+            tokens.add(run)
+        tokens.update(run[i : i + 2] for i in range(len(run) - 1))
+    tokens.update(w for w in ENGLISH_WORD.findall((text or "").lower()) if w not in STOPWORDS)
+    return tokens
+
+
+def load_word_list(filepath):
+    """
+    Reads the TOEFL list ("word#pos. gloss, [同]synonyms;" per line).
+    Repeated words are merged.
+
+    Returns:
+        {word: (parts_of_speech, gloss_tokens, synonyms)}
+    """
+    entries = defaultdict(lambda: (set(), set(), set()))
+    try:
+        with open(filepath, "r", encoding="utf-8") as file:
+            for line in file:
+                word, _, gloss = line.partition("#")
+                word = word.strip()
+                if not HEADWORD.fullmatch(word):
+                    continue
+                pos, tokens, synonyms = entries[word]
+                for group in SYNONYMS.findall(gloss):
+                    synonyms.update(s.strip() for s in group.split(",") if s.strip())
+                pos.update(POS_NAMES[tag] for tag in POS_MARKER.findall(gloss))
+                tokens.update(gloss_tokens(SYNONYMS.sub("", gloss)))
+    except FileNotFoundError:
+        print(f"Error: File not found at {filepath}")
+    return dict(entries)
+
+
+def load_db_profiles(db_file):
+    """
+    Reads parts of speech and glosses from the words and senses tables.
+
+    Returns:
+        {word: (parts_of_speech, gloss_tokens)}; empty if the tables are missing.
+    """
+    profiles = defaultdict(lambda: (set(), set()))
+    conn = sqlite3.connect(db_file)
+    try:
+        tables = {
+            name
+            for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        }
+        if "words" not in tables:
+            return {}
+        columns = [column[1] for column in conn.execute("PRAGMA table_info(words)")]
+        if "short_translation_summary" in columns:
+            for word, summary in conn.execute(
+                "SELECT word, short_translation_summary FROM words "
+                "WHERE short_translation_summary IS NOT NULL"
+            ):
+                profiles[word][1].update(gloss_tokens(summary))
+        if "senses" in tables:
+            for word, pos, translation, definition in conn.execute(
+                """
+                SELECT w.word, s.part_of_speech, s.translation_chn, s.definition_eng
+                FROM senses s JOIN words w ON w.id = s.word_id
+                """
+            ):
+                profile = profiles[word]
+                if normalize_pos(pos):
+                    profile[0].add(normalize_pos(pos))
+                profile[1].update(gloss_tokens(translation))
+                profile[1].update(gloss_tokens(definition))
+    finally:
+        conn.close()
+    return dict(profiles)
+
+
+# --- Similarity Helpers ---
+def deletes(word, max_distance=MAX_EDIT_DISTANCE):
+    """Every string obtained by deleting up to `max_distance` characters."""
+    found = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1 :] for w in frontier for i in range(len(w))}
+        found |= frontier
+    return found
+
+
+def edit_distance(a, b, limit=MAX_EDIT_DISTANCE):
+    """Levenshtein distance, or limit + 1 once it is known to exceed `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(
+                min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            )
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def same_family(a, b):
+    """True for inflections/derivations of one stem ("abandon", "abandoned")."""
+    shared = 0
+    for char_a, char_b in zip(a, b):
+        if char_a != char_b:
+            break
+        shared += 1
+    return shared >= 4 and shared >= min(len(a), len(b)) - 2
+
+
+def shared_affix(a, b, from_end):
+    for length in AFFIX_LENGTHS:
+        if len(a) > length and len(b) > length:
+            if (a[-length:] == b[-length:]) if from_end else (a[:length] == b[:length]):
+                return length
+    return 0
+
+
+class DistractorEngine:
+    """
+    Offline wrong-answer generator for fill-in-the-blank questions.
+
+    The candidate pool is the TOEFL word list (falling back to the words
+    table). Candidates for a word come from three precomputed indexes --
+    spelling neighbours within MAX_EDIT_DISTANCE (a deletion index, so no
+    pairwise comparison is needed), words sharing a prefix or suffix, and
+    words sharing gloss tokens -- and are scored on edit distance, affixes,
+    part of speech and gloss overlap. Words of another part of speech, of the
+    same stem, listed as synonyms or with nearly the same gloss (which could
+    make the question ambiguous) are never suggested. The ranking of a word
+    is computed once and cached, so repeated lookups are dictionary reads.
+    The cache and the fallback choice are guarded by a lock, so one engine
+    can serve several threads.
+
+    Args:
+        db_file: Database with the words (and optionally senses) tables.
+        word_list: The TOEFL word list.
+        seed: Seeds the fallback choice among same-POS words.
+    """
+
+    def __init__(self, db_file: str = DB_FILE, word_list: str = WORD_LIST_FILE, seed=None):
+        entries = load_word_list(word_list)
+        profiles = load_db_profiles(db_file)
+
+        self.pos: Dict[str, Set[str]] = {}
+        self.glosses: Dict[str, Set[str]] = {}
+        self.synonyms: Dict[str, Set[str]] = {}
+        for word in entries or profiles:
+            pos, tokens, synonyms = entries.get(word, (set(), set(), set()))
+            db_pos, db_tokens = profiles.get(word, (set(), set()))
+            self.pos[word] = pos | db_pos
+            self.glosses[word] = tokens | db_tokens
+            self.synonyms[word] = synonyms
+        self.words = sorted(self.pos)
+
+        self.edit_index = defaultdict(list)
+        self.suffix_index = defaultdict(list)
+        self.prefix_index = defaultdict(list)
+        self.gloss_index = defaultdict(list)
+        self.pos_index = defaultdict(list)
+        for word in self.words:
+            key = word.lower()
+            for variant in deletes(key):
+                self.edit_index[variant].append(word)
+            for length in AFFIX_LENGTHS:
+                if len(key) > length:
+                    self.suffix_index[key[-length:]].append(word)
+                    self.prefix_index[key[:length]].append(word)
+            for token in self.glosses[word]:
+                self.gloss_index[token].append(word)
+            for pos in self.pos[word] | {None}:  # None: any part of speech
+                self.pos_index[pos, " " in word].append(word)
+
+        self.ranked: Dict[str, List[Tuple[str, float]]] = {}
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.words)
+
+    def _candidates(self, word, tokens):
+        # Returns (all candidates, the ones that may be within MAX_EDIT_DISTANCE)
+        key = word.lower()
+        neighbours = set()
+        for variant in deletes(key):
+            neighbours.update(self.edit_index.get(variant, ()))
+        candidates = set(neighbours)
+        buckets = [self.suffix_index.get(key[-n:], ()) for n in AFFIX_LENGTHS]
+        buckets += [self.prefix_index.get(key[:n], ()) for n in AFFIX_LENGTHS]
+        buckets += [self.gloss_index.get(token, ()) for token in tokens]
+        for bucket in buckets:
+            if len(bucket) <= MAX_BUCKET_SIZE:
+                candidates.update(bucket)
+        return candidates, neighbours
+
+    def score(self, word: str, candidate: str) -> Optional[float]:
+        """Plausibility of `candidate` as a wrong answer for `word`, or None if unusable."""
+        scored = self._score(word, candidate)
+        return scored and scored[0]
+
+    def _score(self, word, candidate, neighbours=None):
+        # Returns (score, evidence), evidence being the part not due to the POS
+        # match. Edit distance is only computed for `neighbours` when given.
+        a, b = word.lower(), candidate.lower()
+        if a == b or same_family(a, b) or (" " in a) != (" " in b):
+            return None
+        if candidate in self.synonyms.get(word, ()) or word in self.synonyms.get(candidate, ()):
+            return None
+
+        score = -LENGTH_PENALTY * abs(len(a) - len(b))
+        pos_bonus = 0.0
+        pos_a, pos_b = self.pos.get(word), self.pos.get(candidate)
+        if pos_a and pos_b:
+            if not pos_a & pos_b:
+                return None
+            pos_bonus = POS_WEIGHT
+
+        tokens_a, tokens_b = self.glosses.get(word), self.glosses.get(candidate)
+        if tokens_a and tokens_b:
+            overlap = len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+            if overlap >= SYNONYM_OVERLAP:
+                return None
+            score += GLOSS_WEIGHT * overlap
+
+        if neighbours is None or candidate in neighbours:
+            score += EDIT_WEIGHTS.get(edit_distance(a, b), 0.0)
+        if shared_affix(a, b, from_end=True):
+            score += SUFFIX_WEIGHT
+        if shared_affix(a, b, from_end=False):
+            score += PREFIX_WEIGHT
+        return score + pos_bonus, score
+
+    def rank(self, word: str) -> List[Tuple[str, float]]:
+        """The best RANKED_CANDIDATES (candidate, score) pairs for `word`, best first."""
+        with self.lock:
+            ranked = self.ranked.get(word)
+        if ranked is None:  # Ranked outside the lock; a racing thread gets the same list
+            scored = []
+            candidates, neighbours = self._candidates(word, self.glosses.get(word, ()))
+            for candidate in candidates:
+                scored_candidate = self._score(word, candidate, neighbours)
+                if scored_candidate and scored_candidate[1] > 0:  # More than a POS match
+                    scored.append((candidate, scored_candidate[0]))
+            scored.sort(key=lambda item: (-item[1], item[0]))
+            with self.lock:
+                ranked = self.ranked.setdefault(word, scored[:RANKED_CANDIDATES])
+        return ranked
+
+    def suggest(self, word: str, k: int = 3, exclude: Iterable[str] = ()) -> List[str]:
+        """
+        Returns up to `k` distractors for `word`, best first, skipping `exclude`.
+        When too few candidates score, the rest are drawn from words with the
+        same part of speech.
+        """
+        excluded = {w.lower() for w in exclude} | {word.lower()}
+        choices = []
+        for candidate, _ in self.rank(word):
+            if len(choices) == k:
+                return choices
+            if candidate.lower() not in excluded:
+                choices.append(candidate)
+                excluded.add(candidate.lower())
+
+        pool = []
+        for pos in self.pos.get(word) or {None}:
+            pool.extend(self.pos_index.get((pos, " " in word), ()))
+        attempts = 0
+        while len(choices) < k and pool and attempts < 10 * k:
+            attempts += 1
+            with self.lock:
+                candidate = self.random.choice(pool)
+            if candidate.lower() not in excluded and self.score(word, candidate) is not None:
+                choices.append(candidate)
+                excluded.add(candidate.lower())
+        return choices
+
+    def precompute(self):
+        """Ranks every word in the pool (for bulk regeneration)."""
+        for word in self.words:
+            self.rank(word)
+
+
+_engines: Dict[Tuple[str, str], DistractorEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_distractor_engine(
+    db_file: str = DB_FILE, word_list: str = WORD_LIST_FILE
+) -> DistractorEngine:
+    """Returns the shared engine for the inputs, building it on first use."""
+    with _engines_lock:
+        if (db_file, word_list) not in _engines:
+            _engines[db_file, word_list] = DistractorEngine(db_file, word_list)
+        return _engines[db_file, word_list]
+
+
+# --- Bulk Regeneration ---
+def regenerate_wrong_answers(db_file, engine, batch_size=WRITE_BATCH_SIZE):
+    """
+    Replaces the wrong answers of every question with the engine's
+    suggestions, e.g. after the vocabulary changed. Questions for which
+    fewer than three distractors are found keep their current choices.
+
+    Returns:
+        The number of questions updated.
+    """
+    conn = sqlite3.connect(db_file)
+    try:
+        rows = conn.execute("SELECT id, correct_answer FROM questions").fetchall()
+        updates = []
+        updated = 0
+        for question_id, correct_answer in rows:
+            choices = engine.suggest(correct_answer)
+            if len(choices) < 3:
+                continue
+            updates.append((*choices, question_id))
+            if len(updates) >= batch_size:
+                conn.executemany(
+                    "UPDATE questions SET wrong_answer1 = ?, wrong_answer2 = ?, wrong_answer3 = ? WHERE id = ?",
+                    updates,
+                )
+                conn.commit()
+                updated += len(updates)
+                updates.clear()
+        conn.executemany(
+            "UPDATE questions SET wrong_answer1 = ?, wrong_answer2 = ?, wrong_answer3 = ? WHERE id = ?",
+            updates,
+        )
+        conn.commit()
+        updated += len(updates)
+    finally:
+        conn.close()
+    print(f"Regenerated the wrong answers of {updated} of {len(rows)} questions.")
+    return updated
+
+
+def benchmark(engine, words):
+    start = time.perf_counter()
+    engine.precompute()
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for word in words:
+        engine.suggest(word)
+    lookup = (time.perf_counter() - start) / max(len(words), 1)
+    print(f"Ranked {len(engine)} words in {build:.2f} s")
+    print(f"suggest(): {lookup * 1e6:.1f} µs per word (cached ranking)")
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline distractor generator.")
+    parser.add_argument("words", nargs="*", help="Words to suggest distractors for")
+    parser.add_argument("--db", default=DB_FILE, help="SQLite database")
+    parser.add_argument("--word-list", default=WORD_LIST_FILE, help="TOEFL word list")
+    parser.add_argument(
+        "--regenerate",
+        action="store_true",
+        help="Rewrite the wrong answers of every question in the database",
+    )
+    parser.add_argument(
+        "--benchmark", action="store_true", help="Time indexing and lookups"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    engine = DistractorEngine(args.db, args.word_list)
+    print(f"Indexed {len(engine)} words in {time.perf_counter() - start:.2f} s")
+
+    for word in args.words:
+        print(f"{word}: {', '.join(engine.suggest(word))}")
+    if args.benchmark:
+        benchmark(engine, engine.words)
+    if args.regenerate:
+        regenerate_wrong_answers(args.db, engine)
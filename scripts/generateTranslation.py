@@ -1,20 +1,52 @@
+import argparse
+import concurrent.futures
+import itertools
 import sqlite3
-import google.generativeai as genai
 import os
 import re  # Import the regular expression module
+import threading
+import time
 from dotenv import load_dotenv
+from llm_backend import create_backend
+from llm_cache import LLMCache, make_cache_key
 
-# Load environment variables (API Key)
+# Load environment variables (API Key, optional LLM_BACKEND)
 load_dotenv()
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
 GOOGLE_API_KEY = os.getenv("GEMENI_API_KEY")
-if not GOOGLE_API_KEY:
+if not GOOGLE_API_KEY and LLM_BACKEND.startswith("gemini"):
     raise ValueError(
         "Google API key not found in .env file.  Create a .env file with GOOGLE_API_KEY=<your key>"
     )
 
-# Configure the Google Generative AI model
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel("gemini-2.0-pro")
+# Configure the LLM backend (Google Gemini unless LLM_BACKEND says otherwise)
+MODEL_NAME = "gemini-2.0-pro"
+model = create_backend(LLM_BACKEND, default_model=MODEL_NAME, api_key=GOOGLE_API_KEY)
+TRANSLATION_PROMPT = "請將這個句子翻譯成繁體中文。不要使用簡體字。你的翻譯要語意通順，精準，並只能回傳該翻譯。以下是你要翻譯的句子："
+BATCH_TRANSLATION_PROMPT = (
+    "請將以下每個編號的句子翻譯成繁體中文。不要使用簡體字。你的翻譯要語意通順，精準。"
+    "每個翻譯佔一行，開頭保留原本的編號（例如 [1]），不要合併或省略任何句子，也不要回傳其他內容。"
+    "以下是你要翻譯的句子：\n"
+)
+llm_cache = LLMCache()  # Set LLM_CACHE_DISABLE=1 to bypass
+
+# Batched translation
+TRANSLATION_BATCH_SIZE = 20  # Sentences per request
+NUMBERED_LINE = re.compile(r"^\s*\[(\d+)\]\s*(.*?)\s*$", re.MULTILINE)
+batch_stats = {"batch_requests": 0, "batched": 0, "retried": 0}
+batch_stats_lock = threading.Lock()
+
+# Backfill mode
+MAX_WORKERS = 16  # Concurrent translation requests
+PAGE_SIZE = 500  # Untranslated rows read per query
+CHECKPOINT_EVERY = 100  # Translations per commit
+CHECKPOINT_SECONDS = 30.0  # Maximum time between commits
+BLANK_PATTERN = re.compile(r"_+")
+
+
+def build_full_sentence(question_text, correct_answer):
+    """Fills the blank of a question with its answer."""
+    return BLANK_PATTERN.sub(correct_answer, question_text)
 
 
 def translate_to_traditional_chinese(sentence):
@@ -27,11 +59,16 @@ def translate_to_traditional_chinese(sentence):
         The translated sentence, or None if an error occurs.  Prints any errors.
     """
     try:
-        prompt = f"請將這個句子翻譯成繁體中文。不要使用簡體字。你的翻譯要語意通順，精準，並只能回傳該翻譯。以下是你要翻譯的句子：{sentence}"
-        response = model.generate_content(prompt)
+        prompt = f"{TRANSLATION_PROMPT}{sentence}"
+        text = llm_cache.get_or_call(
+            model.cache_name,
+            TRANSLATION_PROMPT,
+            sentence,
+            lambda: model.generate(prompt).text,
+        )
 
-        if response.text:
-            return response.text.strip()  # Remove leading/trailing whitespace
+        if text:
+            return text.strip()  # Remove leading/trailing whitespace
         else:
             print(f"Warning: Empty response from Gemini for sentence: {sentence}")
             return None  # Or perhaps raise an exception
@@ -41,6 +78,115 @@ def translate_to_traditional_chinese(sentence):
         return None
 
 
+def format_numbered_batch(sentences):
+    """Numbers the sentences [1]..[n], one per line."""
+    return "\n".join(
+        f"[{number}] {' '.join(sentence.split())}"
+        for number, sentence in enumerate(sentences, start=1)
+    )
+
+
+def parse_numbered_batch(text, count):
+    """
+    Reads the translations back from a numbered response.
+
+    A line counts only if its number is between 1 and `count`, appears
+    exactly once and has text after it, so a merged, split, dropped or
+    repeated sentence leaves its slot empty instead of shifting the others.
+    If the response stops before line `count`, it was probably cut off and
+    its last line may be a partial translation, so that slot is left empty
+    too.
+
+    Returns:
+        A list of `count` translations with None for every misaligned slot.
+    """
+    found = {}
+    rejected = set()
+    lines = NUMBERED_LINE.findall(text or "")
+    for number, translation in lines:
+        number = int(number)
+        if number in found:
+            rejected.add(number)
+        found[number] = translation
+    if lines and int(lines[-1][0]) < count:
+        rejected.add(int(lines[-1][0]))  # Truncated: never cache or commit it
+    return [
+        found.get(number) if number not in rejected and found.get(number) else None
+        for number in range(1, count + 1)
+    ]
+
+
+def translate_batch(sentences):
+    """Translates several sentences with one request.
+
+    Sentences that are already cached are not sent again. The response is
+    checked by count and by number; every sentence without exactly one
+    aligned translation (including the last line of a cut-off response) is
+    retried on its own with translate_to_traditional_chinese.
+
+    Args:
+        sentences: The sentences to translate.
+
+    Returns:
+        The translations in the same order, None where translation failed.
+    """
+    if len(sentences) == 1:
+        return [translate_to_traditional_chinese(sentences[0])]
+
+    if model.cache_name:
+        keys = [
+            make_cache_key(model.cache_name, BATCH_TRANSLATION_PROMPT, s)
+            for s in sentences
+        ]
+        translations = [llm_cache.get(key) for key in keys]
+    else:  # Test backend: never cached
+        keys = [None] * len(sentences)
+        translations = [None] * len(sentences)
+    missing = [i for i, translation in enumerate(translations) if translation is None]
+
+    if len(missing) > 1:
+        prompt = BATCH_TRANSLATION_PROMPT + format_numbered_batch(
+            [sentences[i] for i in missing]
+        )
+        try:
+            text = model.generate(prompt).text
+        except Exception as e:
+            print(f"Error during batch translation: {e}")
+            text = None
+        aligned = parse_numbered_batch(text, len(missing))
+        if text is not None and sum(t is not None for t in aligned) < len(missing):
+            print(
+                f"Batch response misaligned: {len(missing) - sum(t is not None for t in aligned)}"
+                f" of {len(missing)} sentences will be retried individually."
+            )
+        for i, translation in zip(missing, aligned):
+            if translation is not None:
+                translations[i] = translation
+                if keys[i]:
+                    llm_cache.put(keys[i], translation)
+        with batch_stats_lock:
+            batch_stats["batch_requests"] += 1
+            batch_stats["batched"] += len(missing)
+
+    retry = [i for i, translation in enumerate(translations) if translation is None]
+    for i in retry:
+        translations[i] = translate_to_traditional_chinese(sentences[i])
+    with batch_stats_lock:
+        batch_stats["retried"] += len(retry)
+    return translations
+
+
+def add_translation_column(cursor):
+    try:
+        cursor.execute("ALTER TABLE questions ADD COLUMN translation TEXT")
+        print("Added 'translation' column to 'questions' table.")
+    except sqlite3.OperationalError as e:
+        if "duplicate column name" in str(e):
+            print("The 'translation' column already exists.")
+        else:
+            raise  # Re-raise other OperationalErrors
+
+
 def update_database_with_translations(db_path):
     """Adds a 'translation' column to the 'questions' table and populates it.
 
@@ -52,14 +198,7 @@ def update_database_with_translations(db_path):
         cursor = conn.cursor()
 
         # 1. Add the 'translation' column (if it doesn't exist)
-        try:
-            cursor.execute("ALTER TABLE questions ADD COLUMN translation TEXT")
-            print("Added 'translation' column to 'questions' table.")
-        except sqlite3.OperationalError as e:
-            if "duplicate column name" in str(e):
-                print("The 'translation' column already exists.")
-            else:
-                raise  # Re-raise other OperationalErrors
+        add_translation_column(cursor)
 
         # 2. Iterate through each question
         cursor.execute("SELECT id, question, correct_answer FROM questions")
@@ -67,7 +206,7 @@ def update_database_with_translations(db_path):
 
         for question_id, question_text, correct_answer in questions:
             # 3. Construct the full sentence using regular expressions
-            full_sentence = re.sub(r"_+", correct_answer, question_text)  # Use regex!
+            full_sentence = build_full_sentence(question_text, correct_answer)
 
             # 4. Get the translation
             translated_sentence = translate_to_traditional_chinese(full_sentence)
@@ -86,6 +225,7 @@ def update_database_with_translations(db_path):
 
         conn.commit()  # Save changes
         print("Database update complete.")
+        print(llm_cache.stats())
 
     except sqlite3.Error as e:
         print(f"SQLite error: {e}")
@@ -94,7 +234,179 @@ def update_database_with_translations(db_path):
             conn.close()
 
 
+def iter_untranslated(conn, page_size=PAGE_SIZE):
+    """
+    Streams (id, question, correct_answer) of untranslated questions in id
+    order, one page per query, so no read cursor stays open across commits.
+    """
+    last_id = -1
+    while True:
+        rows = conn.execute(
+            "SELECT id, question, correct_answer FROM questions "
+            "WHERE translation IS NULL AND id > ? ORDER BY id LIMIT ?",
+            (last_id, page_size),
+        ).fetchall()
+        if not rows:
+            return
+        yield from rows
+        last_id = rows[-1][0]
+
+
+def backfill_translations(
+    db_path,
+    max_workers=MAX_WORKERS,
+    checkpoint_every=CHECKPOINT_EVERY,
+    checkpoint_seconds=CHECKPOINT_SECONDS,
+    batch_size=TRANSLATION_BATCH_SIZE,
+):
+    """
+    Translates only the questions that have no translation yet.
+
+    Rows are streamed page by page, grouped into `batch_size` sentences per
+    request (see translate_batch) and translated by `max_workers` threads
+    with a bounded number of batches in flight; the results are committed
+    every `checkpoint_every` translations (or `checkpoint_seconds`). Since
+    only NULL translations are selected, an interrupted run simply continues
+    where its last checkpoint left off, and failed rows are retried on the
+    next run.
+
+    Args:
+        db_path: Path to the SQLite database file.
+        max_workers: Concurrent translation requests.
+        checkpoint_every: Translations per commit.
+        checkpoint_seconds: Maximum seconds between commits.
+        batch_size: Sentences per request; 1 sends each one on its own.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        add_translation_column(cursor)
+        conn.commit()
+
+        (remaining,) = cursor.execute(
+            "SELECT COUNT(*) FROM questions WHERE translation IS NULL"
+        ).fetchone()
+        print(f"{remaining} questions need a translation.")
+
+        rows = iter_untranslated(conn)
+        pending_updates = []
+        translated = failed = 0
+        last_checkpoint = time.monotonic()
+        started = last_checkpoint
+
+        def record(question_ids, translations):
+            nonlocal translated, failed
+            for question_id, translated_sentence in zip(question_ids, translations):
+                if translated_sentence:
+                    pending_updates.append((translated_sentence, question_id))
+                    translated += 1
+                else:
+                    print(
+                        f"Skipped updating question ID {question_id} due to translation error."
+                    )
+                    failed += 1
+
+        def checkpoint():
+            nonlocal last_checkpoint
+            cursor.executemany(
+                "UPDATE questions SET translation = ? WHERE id = ?", pending_updates
+            )
+            conn.commit()
+            pending_updates.clear()
+            last_checkpoint = time.monotonic()
+            rate = translated / max(last_checkpoint - started, 1e-9)
+            print(
+                f"Checkpoint: {translated}/{remaining} translated, {failed} failed "
+                f"({rate:.1f}/s)"
+            )
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            in_flight = {}
+            try:
+                while True:
+                    while len(in_flight) < 2 * max_workers:
+                        batch = list(itertools.islice(rows, batch_size))
+                        if not batch:
+                            break
+                        sentences = [
+                            build_full_sentence(question_text, correct_answer)
+                            for _, question_text, correct_answer in batch
+                        ]
+                        future = executor.submit(translate_batch, sentences)
+                        in_flight[future] = [question_id for question_id, _, _ in batch]
+                    if not in_flight:
+                        break
+
+                    done, _ = concurrent.futures.wait(
+                        in_flight, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        record(in_flight.pop(future), future.result())
+
+                    if len(pending_updates) >= checkpoint_every or (
+                        time.monotonic() - last_checkpoint >= checkpoint_seconds
+                    ):
+                        checkpoint()
+            finally:
+                for future in concurrent.futures.as_completed(in_flight):
+                    record(in_flight[future], future.result())
+                checkpoint()
+
+        print("Backfill complete.")
+        print(
+            f"Requests: {batch_stats['batch_requests']} batched "
+            f"({batch_stats['batched']} sentences), "
+            f"{batch_stats['retried']} individual retries"
+        )
+        print(llm_cache.stats())
+    finally:
+        conn.close()
+
+
 # --- Main Execution ---
 if __name__ == "__main__":
     db_file = "vocabulary.db"  # Replace with your actual database file name
-    update_database_with_translations(db_file)
+
+    parser = argparse.ArgumentParser(
+        description="Translate question sentences into Traditional Chinese."
+    )
+    parser.add_argument("--db", default=db_file, help="SQLite database to update")
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Only translate questions without a translation, concurrently "
+        "and with periodic checkpoints (restartable)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=MAX_WORKERS, help="Concurrent requests (backfill)"
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=CHECKPOINT_EVERY,
+        help="Translations per commit (backfill)",
+    )
+    parser.add_argument(
+        "--checkpoint-seconds",
+        type=float,
+        default=CHECKPOINT_SECONDS,
+        help="Maximum seconds between commits (backfill)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=TRANSLATION_BATCH_SIZE,
+        help="Sentences per translation request (backfill)",
+    )
+    args = parser.parse_args()
+
+    if args.backfill:
+        backfill_translations(
+            args.db,
+            args.workers,
+            args.checkpoint_every,
+            args.checkpoint_seconds,
+            args.batch_size,
+        )
+    else:
+        update_database_with_translations(args.db)
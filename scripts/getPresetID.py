@@ -1,8 +1,10 @@
+import argparse
 import re
-import sqlite3
 import csv
 import uuid
 
+from word_index import WordIndex
+
 
 def process_word_list(filepath):
     """
@@ -28,28 +30,19 @@ def process_word_list(filepath):
     return words
 
 
-def create_word_to_id_mapping(db_path, word_list):
+def create_word_to_id_mapping(db_path, word_list, casefold=False):
     """
     Creates a mapping of words to their corresponding IDs in the database.
 
     Args:
         db_path (str): The path to the SQLite database.
         word_list (list): A list of words to map to IDs.
+        casefold (bool): Match case-insensitively if there is no exact match.
 
     Returns:
         dict: A dictionary mapping words to their IDs.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    word_to_id = {}
-    for word in word_list:
-        cursor.execute("SELECT id FROM words WHERE word = ?", (word,))
-        result = cursor.fetchone()
-        if result:
-            word_to_id[word] = result[0]
-    conn.close()
-    return word_to_id
+    return WordIndex(db_path, casefold).resolve(word_list)  # One query for the whole list
 
 
 def output_csv(word_to_id, output_filepath, uuid_str):
@@ -69,6 +62,14 @@ def output_csv(word_to_id, output_filepath, uuid_str):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the word IDs of the TOEFL list.")
+    parser.add_argument(
+        "--casefold",
+        action="store_true",
+        help="Match words case-insensitively when there is no exact match",
+    )
+    args = parser.parse_args()
+
     # Configuration
     txt_filepath = "toefl_word_list.txt"  # Replace with your actual file path
     db_filepath = "vocabulary.db"  # Replace with your database file path
@@ -79,7 +80,7 @@ if __name__ == "__main__":
     words = process_word_list(txt_filepath)
 
     # Create the word-to-ID mapping
-    word_to_id = create_word_to_id_mapping(db_filepath, words)
+    word_to_id = create_word_to_id_mapping(db_filepath, words, args.casefold)
 
     # Output the CSV file
     output_csv(word_to_id, csv_output_filepath, static_uuid)
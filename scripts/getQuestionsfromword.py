@@ -1,10 +1,38 @@
-import json
+import argparse
+import itertools
 import random
-import os
-import google.generativeai as genai
 import sqlite3
+import threading
+import time
 from typing import Tuple, List, Optional
 import concurrent.futures
+from llm_backend import create_backend
+from distractors import get_distractor_engine
+from llm_cache import LLMCache
+from llm_json import (
+    LLMJSONError,
+    decode_llm_json,
+    validate_question,
+    validate_question_stem,
+)
+from pipeline_metrics import PipelineMetrics
+from question_dedup import QuestionDedupIndex
+from word_index import get_word_index
+
+MODEL_NAME = "gemini-2.0-flash-lite"
+DB_FILE = "vocabulary.db"
+MAX_WORKERS = 10  # Concurrent LLM requests
+MAX_IN_FLIGHT = 2 * MAX_WORKERS  # Words submitted but not yet written
+WRITE_BATCH_SIZE = 50  # Questions per transaction
+METRICS_JSONL = "question_metrics.jsonl"
+METRICS_PROM = "question_metrics.prom"
+VERBOSE = False  # --verbose: also log raw LLM responses
+metrics = PipelineMetrics("questions", throughput_counter="words_done")  # In memory until __main__
+_llm_backend = None
+_llm_backend_lock = threading.Lock()
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+_random_lock = threading.Lock()  # The module-level random is shared by the workers
 
 
 def get_clean_words(filepath):
@@ -33,186 +61,273 @@ def get_clean_words(filepath):
     return list(words)
 
 
+def get_llm_backend():
+    """Creates the backend selected by LLM_BACKEND (Gemini by default) once."""
+    global _llm_backend
+    with _llm_backend_lock:
+        if _llm_backend is None:
+            _llm_backend = create_backend(default_model=MODEL_NAME)
+        return _llm_backend
+
+
+def get_llm_cache():
+    """Opens the LLM response cache once (set LLM_CACHE_DISABLE=1 to bypass)."""
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMCache()
+        return _llm_cache
+
+
 def call_gemini_api(prompt):
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY environment variable not set.")
+    model = get_llm_backend()
 
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel("gemini-2.0-flash-lite")
+    def generate():
+        try:
+            with metrics.time("llm_api"):
+                response = model.generate(prompt)
+            metrics.inc("llm_requests")
+            metrics.inc("tokens_in", response.input_tokens or len(prompt) // 4 + 1)
+            metrics.inc("tokens_out", response.output_tokens or len(response.text) // 4 + 1)
+            return response.text
+        except Exception as e:
+            print(f"Error calling Gemini API: {e}")
+            metrics.inc("llm_errors")
+            return ""  # Return an empty string on error (never cached)
 
-    try:
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        print(f"Error calling Gemini API: {e}")
-        return ""  # Return an empty string on error
+    return get_llm_cache().get_or_call(model.cache_name, prompt, "", generate)
 
 
 def generate_fill_in_the_blank_question(
-    word, all_words
+    word, all_words, offline_distractors=False
 ) -> Tuple[Optional[str], Optional[str], Optional[List[str]]]:
     """
     Generates a fill-in-the-blank question using the Gemini API.
 
     Args:
         word: The target word for the question.
+        offline_distractors: Ask only for the sentence and take all three
+            wrong choices from the distractor engine, which saves the output
+            tokens of the model's choices.
 
     Returns:
         A dictionary containing the question, correct answer, and choices.
     """
-    prompt = f"Make a “fill in the blank” question with the word “{word}” The sentence should be in undergraduate level. Also generate three wrong choices that might be misused by a student. \n\nMake sure the sentence have adequate context in order to ensure only one answer is applicable.\n\nReturn the sentence and options in the following json format:\n\n{{”question”: “”, correctAnswer: “” ,“wrongChoices”: [””, ””, ””]}}"
+    if offline_distractors:
+        prompt = f"Make a “fill in the blank” question with the word “{word}” The sentence should be in undergraduate level.\n\nMake sure the sentence have adequate context in order to ensure only one answer is applicable.\n\nReturn the sentence and answer in the following json format:\n\n{{”question”: “”, correctAnswer: “”}}"
+        validator = validate_question_stem
+    else:
+        prompt = f"Make a “fill in the blank” question with the word “{word}” The sentence should be in undergraduate level. Also generate three wrong choices that might be misused by a student. \n\nMake sure the sentence have adequate context in order to ensure only one answer is applicable.\n\nReturn the sentence and options in the following json format:\n\n{{”question”: “”, correctAnswer: “” ,“wrongChoices”: [””, ””, ””]}}"
+        validator = validate_question
     response_text = call_gemini_api(prompt)
 
-    print(f"Raw response: {response_text}")
-
-    # Clean the response text
-    cleaned_response = response_text.strip()
-    cleaned_response = cleaned_response.replace("```json", "").replace("```", "")
+    if VERBOSE:
+        print(f"Raw response: {response_text}")
 
     try:
-        response_json = json.loads(cleaned_response)
+        # Extract, repair (smart quotes, unquoted keys, ...) and validate the JSON
+        with metrics.time("json_decode"):
+            response_json = decode_llm_json(response_text, validator)
         question = response_json["question"]
         correct_answer = response_json["correctAnswer"]
-        choices = response_json["wrongChoices"]
+        choices = [] if offline_distractors else response_json["wrongChoices"]
 
         # Remove any empty strings that might be present
         choices = [choice for choice in choices if choice]
 
-        # If more than 4 choices, reduce to 4 by:
-        # 1. Keep correct answer
-        # 2. Randomly select among the rest
-        if len(choices) > 3:
-            other_choices = [c for c in choices if c != correct_answer]
-            random.shuffle(other_choices)
-            choices = [correct_answer] + other_choices[:3]
-
-        # If less than 4 choices, fill with random words
-        while len(choices) < 3:
-            random_word = random.choice(all_words)
-            if random_word != correct_answer and random_word not in choices:
-                choices.append(random_word)
-
-        random.shuffle(choices)  # Shuffle for randomness
+        with _random_lock:
+            # If more than 4 choices, reduce to 4 by:
+            # 1. Keep correct answer
+            # 2. Randomly select among the rest
+            if len(choices) > 3:
+                other_choices = [c for c in choices if c != correct_answer]
+                random.shuffle(other_choices)
+                choices = [correct_answer] + other_choices[:3]
+
+            # If less than 4 choices, fill with offline distractors (random words
+            # only if the engine has too few candidates)
+            if len(choices) < 3:
+                choices += get_distractor_engine(DB_FILE).suggest(
+                    correct_answer, 3 - len(choices), exclude=choices
+                )
+            while len(choices) < 3:
+                random_word = random.choice(all_words)
+                if random_word != correct_answer and random_word not in choices:
+                    choices.append(random_word)
+
+            random.shuffle(choices)  # Shuffle for randomness
 
         return question, correct_answer, choices
 
-    except (json.JSONDecodeError, KeyError) as e:
+    except (LLMJSONError, KeyError) as e:
         print(f"Error processing Gemini response: {e}")
+        metrics.inc("json_errors")
         return None, None, None
     except Exception as e:
         print("another error", e)
         return None, None, None
 
-        return None, None, None
-
 
-def get_word_id(word: str) -> Optional[int]:
+class QuestionWriter:
+    """
+    Writes questions through a single connection, committing every
+    `batch_size` questions in one executemany transaction instead of
+    opening a connection and committing per question. Questions that are
+    near-duplicates of existing ones are flagged (but still written).
     """
-    Retrieves the ID of a word from the database.
 
-    Args:
-        word: The word to search for.
+    def __init__(self, db_file=DB_FILE, batch_size=WRITE_BATCH_SIZE):
+        self.conn = sqlite3.connect(db_file)
+        self.word_index = get_word_index(db_file)
+        self.dedup_index = QuestionDedupIndex(db_file)
+        self.batch_size = batch_size
+        self.pending = []
+        self.written = 0
+
+    def add(self, question: str, correct_answer: str, choices: List[str]) -> bool:
+        """Queues a question; returns False if its word is not in the database."""
+        if len(choices) != 3:
+            raise ValueError("The choices list must contain exactly three wrong answers.")
+
+        word_id = self.word_index.get(correct_answer)
+        if word_id is None:
+            print(f"Error: Word '{correct_answer}' not found in the 'words' table.")
+            return False
+
+        duplicates = self.dedup_index.add(question)
+        if duplicates:
+            question_id, score = duplicates[0]
+            shown = "this run" if question_id < 0 else f"ID {question_id}"
+            print(
+                f"Near-duplicate question for '{correct_answer}' ({score:.0%} similar to {shown}): {question}"
+            )
+            metrics.inc("near_duplicates")
 
-    Returns:
-        The ID of the word if found, otherwise None.
-    """
+        self.pending.append(
+            (word_id, question, correct_answer, choices[0], choices[1], choices[2])
+        )
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        if not self.pending:
+            return
+        try:
+            with metrics.time("sqlite_write"):
+                self.conn.executemany(
+                    """
+                    INSERT INTO questions (word_id, question, correct_answer, wrong_answer1, wrong_answer2, wrong_answer3)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    self.pending,
+                )
+                self.conn.commit()
+            metrics.inc("inserted", len(self.pending))
+            self.written += len(self.pending)
+            print(f"Committed {len(self.pending)} questions ({self.written} total)")
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            print(f"Database error, dropped {len(self.pending)} questions: {e}")
+            metrics.inc("insert_errors", len(self.pending))
+        self.pending.clear()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+        self.dedup_index.sync()  # Store the signatures of the new questions
+
+
+def handle_result(future, word, submitted_at, writer):
     try:
-        conn = sqlite3.connect("vocabulary.db")  # Connect to the database
-        cursor = conn.cursor()
+        question, correct_answer, choices = future.result()
+        metrics.observe("generate", time.monotonic() - submitted_at)
 
-        # Use a parameterized query to prevent SQL injection
-        cursor.execute("SELECT id FROM words WHERE word = ?", (word,))
-        result = cursor.fetchone()
-
-        if result:
-            return result[0]  # Return the ID
+        if not (question and correct_answer and choices):
+            metrics.inc("words_unparsed")  # No usable question in the response
+        elif writer.add(question, correct_answer, choices):
+            metrics.inc("words_done")
         else:
-            return None  # Word not found
-
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return None
+            metrics.inc("words_not_found")
 
-    finally:
-        if conn:
-            conn.close()
+    except Exception as e:
+        print(f"Error processing word '{word}': {e}")
+        metrics.inc("words_failed")
 
 
-def add_question_to_db(
-    question: str, correct_answer: str, choices: List[str]
-) -> Optional[int]:
+def generate_questions(
+    all_words,
+    max_workers=MAX_WORKERS,
+    max_in_flight=MAX_IN_FLIGHT,
+    offline_distractors=False,
+):
     """
-    Adds a question and its associated data to the database.
-
-    Args:
-        question: The question text.
-        correct_answer: The correct answer.
-        choices: A list of three wrong answer choices.
-
-    Returns:
-        question id if successfully added.
+    Generates a question per word with `max_workers` concurrent requests.
+    At most `max_in_flight` words are submitted ahead of the results, which
+    are consumed as they complete and written by one QuestionWriter. With
+    `offline_distractors` the wrong choices all come from the distractor
+    engine (see generate_fill_in_the_blank_question).
     """
-    if len(choices) != 3:
-        raise ValueError("The choices list must contain exactly three wrong answers.")
-
-    word_id = get_word_id(correct_answer)
-    if word_id is None:
-        print(f"Error: Word '{correct_answer}' not found in the 'words' table.")
-        return None
-
-    try:
-        conn = sqlite3.connect("vocabulary.db")
-        cursor = conn.cursor()
-
-        cursor.execute(
-            """
-            INSERT INTO questions (word_id, question, correct_answer, wrong_answer1, wrong_answer2, wrong_answer3)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (word_id, question, correct_answer, choices[0], choices[1], choices[2]),
-        )
-        conn.commit()
-        print(f"Question added to database with ID: {cursor.lastrowid}")
-        return cursor.lastrowid
-
-    except sqlite3.IntegrityError as e:
-        print(f"Database integrity error: {e}")
-        print(
-            "This usually means a foreign key constraint failed (e.g., word_id does not exist)."
-        )
-        return None
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return None
-    finally:
-        if conn:
-            conn.close()
+    get_distractor_engine(DB_FILE)  # Built once here, not by the first workers
+    writer = QuestionWriter()
+    words = iter(all_words)
+    in_flight = {}  # future -> (word, submitted_at)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            while True:
+                for word in itertools.islice(words, max_in_flight - len(in_flight)):
+                    future = executor.submit(
+                        generate_fill_in_the_blank_question,
+                        word,
+                        all_words,
+                        offline_distractors,
+                    )
+                    in_flight[future] = (word, time.monotonic())
+                if not in_flight:
+                    break
+
+                # Handle whatever finished first, then top the window back up
+                done, _ = concurrent.futures.wait(
+                    in_flight, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    word, submitted_at = in_flight.pop(future)
+                    handle_result(future, word, submitted_at, writer)
+        finally:
+            # On an interrupt, still write what has already been generated
+            for future in concurrent.futures.as_completed(in_flight):
+                word, submitted_at = in_flight[future]
+                handle_result(future, word, submitted_at, writer)
+            writer.close()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate a fill-in-the-blank question for every word."
+    )
+    parser.add_argument(
+        "--offline-distractors",
+        action="store_true",
+        help="Ask the model only for the sentence and pick all three wrong "
+        "choices with the offline distractor engine",
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Print every raw LLM response"
+    )
+    args = parser.parse_args()
+    VERBOSE = args.verbose
+
     filepath = "toefl_word_list.txt"  # Assuming 'words.txt' in the same directory
     all_words = get_clean_words(filepath)
     if not all_words:
         print("No words found. Exiting.")
         exit()
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        for word in all_words:
-            # Use submit to schedule the function for execution and return a Future object
-            future = executor.submit(
-                generate_fill_in_the_blank_question, word, all_words
-            )
-
-            try:
-                # Get the result from the Future, which will block until the function is done
-                question, correct_answer, choices = future.result()
-
-                if question and correct_answer and choices:
-                    # Add the question to the database
-                    question_id = add_question_to_db(question, correct_answer, choices)
-                    if question_id:
-                        print(f"Added question for word '{word}' with ID {question_id}")
-
-            except Exception as e:
-                print(f"Error processing word '{word}': {e}")
+    metrics = PipelineMetrics(
+        "questions", METRICS_JSONL, METRICS_PROM, throughput_counter="words_done"
+    )
+    metrics.start()
+    generate_questions(all_words, offline_distractors=args.offline_distractors)
+    metrics.close()
+    print(get_llm_cache().stats())
@@ -0,0 +1,410 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Configuration ---
+BACKEND_SPEC = os.getenv("LLM_BACKEND", "gemini")  # See create_backend for the syntax
+MOCK_SERVER_PORT = 8765
+
+
+class RateLimitError(Exception):
+    """Raised by the mock backends in place of an HTTP 429 from the API."""
+
+
+class LLMResponse:
+    """Text of one completion plus the token usage reported for it (if any)."""
+
+    def __init__(self, text, input_tokens=None, output_tokens=None):
+        self.text = text
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+    @property
+    def total_tokens(self):
+        if self.input_tokens is None or self.output_tokens is None:
+            return None
+        return self.input_tokens + self.output_tokens
+
+
+class LLMBackend:
+    """
+    Interface every backend implements. `generate` is used from threads,
+    `generate_async` from the asyncio engine; the default async version runs
+    the blocking call in a worker thread.
+
+    `cache_name` identifies the model that produces the responses and is what
+    the LLM cache keys them on. It is None for the test backends (mock, http,
+    replay), whose responses must never be cached and replayed in real runs.
+    """
+
+    name = "base"
+    cache_name = None
+
+    def generate(self, prompt):
+        raise NotImplementedError
+
+    async def generate_async(self, prompt):
+        return await asyncio.to_thread(self.generate, prompt)
+
+    def close(self):
+        pass
+
+
+# --- Google Gemini ---
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, model_name, api_key=None):
+        import google.generativeai as genai  # Only needed for real API calls
+
+        api_key = api_key or os.environ.get("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("Please set the GEMINI_API_KEY environment variable.")
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.cache_name = f"gemini:{model_name}"
+        self.model = genai.GenerativeModel(model_name)
+
+    @staticmethod
+    def _wrap(response):
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResponse(
+            response.text,
+            getattr(usage, "prompt_token_count", None),
+            getattr(usage, "candidates_token_count", None),
+        )
+
+    def generate(self, prompt):
+        return self._wrap(self.model.generate_content(prompt))
+
+    async def generate_async(self, prompt):
+        return self._wrap(await self.model.generate_content_async(prompt))
+
+
+# --- Offline Mock ---
+def default_mock_responder(prompt):
+    """
+    Produces a schema-valid answer for each prompt used by the scripts:
+    dictionary enrichment (single and batched), fill-in-the-blank questions
+    and sentence translation.
+    """
+    example = {
+        "example_order": 0,
+        "phrase_marker": None,
+        "sentence_eng": "This is a mock example sentence.",
+        "sentence_chn": "這是一個模擬例句。",
+        "source": "generated",
+    }
+    entry = {
+        "short_translation_summary": "模擬",
+        "senses": [
+            {
+                "sense_order": 0,
+                "translation_chn": "模擬",
+                "definition_eng": "a mock definition",
+                "part_of_speech": "noun",
+                "examples": [example],
+            }
+        ],
+    }
+
+    headwords = re.findall(r"^### Headword: (.+)$", prompt, re.MULTILINE)
+    if headwords:
+        return json.dumps([dict(entry, word=word) for word in headwords])
+    if "short_translation_summary" in prompt:
+        return "```json\n" + json.dumps(entry, ensure_ascii=False) + "\n```"
+
+    word = re.search(r"with the word “(.+?)”", prompt)
+    if word:
+        return json.dumps(
+            {
+                "question": "The committee decided to ________ the old plan.",
+                "correctAnswer": word.group(1),
+                "wrongChoices": ["adopt", "adapt", "adept"],
+            }
+        )
+
+    numbered = re.findall(r"^\[(\d+)\] ", prompt, re.MULTILINE)
+    if numbered:  # Batched translation
+        return "\n".join(f"[{number}] 這是模擬翻譯。" for number in numbered)
+
+    return "這是模擬翻譯。"
+
+
+class MockBackend(LLMBackend):
+    """
+    In-process stand-in for the API with configurable latency and failures.
+
+    Args:
+        latency: Median response time in seconds.
+        jitter: Spread of the latency; its meaning depends on `distribution`.
+        distribution: "constant", "uniform" (latency ± jitter) or "lognormal"
+            (median `latency`, sigma `jitter`).
+        error_rate: Probability of raising RateLimitError (a 429).
+        malformed_rate: Probability of returning truncated, invalid JSON.
+        seed: Makes the failure/latency sequence reproducible.
+        responder: Callable mapping a prompt to the response text.
+    """
+
+    name = "mock"
+
+    def __init__(
+        self,
+        latency=0.5,
+        jitter=0.5,
+        distribution="lognormal",
+        error_rate=0.0,
+        malformed_rate=0.0,
+        seed=None,
+        responder=default_mock_responder,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.distribution = distribution
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.responder = responder
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()  # random.Random isn't safe to share unguarded
+
+    def _draw(self):
+        with self.lock:
+            if self.distribution == "constant":
+                delay = self.latency
+            elif self.distribution == "uniform":
+                delay = self.random.uniform(
+                    self.latency - self.jitter, self.latency + self.jitter
+                )
+            else:
+                delay = self.latency * self.random.lognormvariate(0, self.jitter)
+            return max(delay, 0), self.random.random(), self.random.random()
+
+    def _respond(self, prompt, error_roll, malformed_roll):
+        if error_roll < self.error_rate:
+            raise RateLimitError("429 Resource has been exhausted (mock)")
+        text = self.responder(prompt)
+        if malformed_roll < self.malformed_rate:
+            text = text[: max(len(text) // 2, 1)]  # Cut off mid-JSON
+        return LLMResponse(text, len(prompt) // 4 + 1, len(text) // 4 + 1)
+
+    def generate(self, prompt):
+        delay, error_roll, malformed_roll = self._draw()
+        time.sleep(delay)
+        return self._respond(prompt, error_roll, malformed_roll)
+
+    async def generate_async(self, prompt):
+        delay, error_roll, malformed_roll = self._draw()
+        await asyncio.sleep(delay)
+        return self._respond(prompt, error_roll, malformed_roll)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """POST {"prompt": ...} -> {"text", "input_tokens", "output_tokens"}."""
+
+    backend = None  # Set by serve_mock
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        prompt = json.loads(body)["prompt"]
+        try:
+            response = self.backend.generate(prompt)
+            status = 200
+            payload = {
+                "text": response.text,
+                "input_tokens": response.input_tokens,
+                "output_tokens": response.output_tokens,
+            }
+        except RateLimitError as e:
+            status, payload = 429, {"error": str(e)}
+
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # Keep the benchmark output readable
+
+
+def serve_mock(backend, host="127.0.0.1", port=MOCK_SERVER_PORT):
+    """Serves `backend` over HTTP until interrupted (each request gets a thread)."""
+    handler = type("BoundMockHandler", (MockHandler,), {"backend": backend})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Mock LLM server listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+class HTTPBackend(LLMBackend):
+    """Client for serve_mock, so the mock can run in a separate process."""
+
+    name = "http"
+
+    def __init__(self, url, timeout=60):
+        self.url = url
+        self.timeout = timeout
+
+    def generate(self, prompt):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"prompt": prompt}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                payload = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            if e.code == 429:
+                raise RateLimitError(e.read().decode("utf-8", "replace")) from e
+            raise
+        return LLMResponse(
+            payload["text"], payload.get("input_tokens"), payload.get("output_tokens")
+        )
+
+
+# --- Record / Replay ---
+def prompt_digest(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class RecordReplayBackend(LLMBackend):
+    """
+    In "record" mode, forwards to `inner` and appends every response to a
+    JSON-lines file. In "replay" mode, answers only from that file (raising
+    KeyError for prompts never recorded), which makes benchmark runs
+    deterministic and free.
+    """
+
+    name = "record"
+
+    def __init__(self, path, mode="replay", inner=None):
+        if mode == "record" and inner is None:
+            raise ValueError("Record mode needs a backend to record from.")
+        self.path = path
+        self.mode = mode
+        self.inner = inner
+        # Recording passes the real model's responses through; replays are test data
+        self.cache_name = inner.cache_name if mode == "record" else None
+        self.lock = threading.Lock()
+        self.recordings = {}
+        self.file = None
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.recordings[record["prompt_sha256"]] = record
+        elif mode == "replay":
+            raise FileNotFoundError(f"No recording found at {path}")
+
+    def _replay(self, prompt):
+        record = self.recordings.get(prompt_digest(prompt))
+        if record is None:
+            raise KeyError(f"Prompt not in recording {self.path}")
+        return LLMResponse(
+            record["text"], record.get("input_tokens"), record.get("output_tokens")
+        )
+
+    def _record(self, prompt, response):
+        record = {
+            "prompt_sha256": prompt_digest(prompt),
+            "text": response.text,
+            "input_tokens": response.input_tokens,
+            "output_tokens": response.output_tokens,
+        }
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, "a", encoding="utf-8")
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.file.flush()
+            self.recordings[record["prompt_sha256"]] = record
+        return response
+
+    def generate(self, prompt):
+        if self.mode == "replay":
+            return self._replay(prompt)
+        return self._record(prompt, self.inner.generate(prompt))
+
+    async def generate_async(self, prompt):
+        if self.mode == "replay":
+            return self._replay(prompt)
+        return self._record(prompt, await self.inner.generate_async(prompt))
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+        if self.inner is not None:
+            self.inner.close()
+
+
+def parse_options(text):
+    """Parses "key=value,key=value" into a dict with numeric values converted."""
+    options = {}
+    for item in filter(None, text.split(",")):
+        key, _, value = item.partition("=")
+        try:
+            options[key] = float(value) if "." in value else int(value)
+        except ValueError:
+            options[key] = value
+    return options
+
+
+def create_backend(spec=None, default_model=None, api_key=None):
+    """
+    Builds a backend from a spec string:
+
+        gemini                      Gemini with `default_model`
+        gemini:<model>              Gemini with an explicit model
+        mock[:key=value,...]        MockBackend, e.g. mock:latency=0.2,error_rate=0.05
+        http://host:port/           HTTPBackend talking to serve_mock
+        record:<path>:<inner spec>  Record <inner spec>'s responses to <path>
+        replay:<path>               Replay responses recorded to <path>
+
+    Args:
+        spec: The spec string; defaults to the LLM_BACKEND environment variable.
+        default_model: Model used by a bare "gemini" spec.
+        api_key: Gemini API key; defaults to the GEMINI_API_KEY environment variable.
+    """
+    spec = spec or BACKEND_SPEC
+    kind, _, rest = spec.partition(":")
+
+    if kind == "gemini":
+        return GeminiBackend(rest or default_model, api_key)
+    if kind == "mock":
+        return MockBackend(**parse_options(rest))
+    if kind in ("http", "https"):
+        return HTTPBackend(spec)
+    if kind == "record":
+        path, _, inner_spec = rest.partition(":")
+        inner = create_backend(inner_spec or "gemini", default_model, api_key)
+        return RecordReplayBackend(path, "record", inner)
+    if kind == "replay":
+        return RecordReplayBackend(rest, "replay")
+    raise ValueError(f"Unknown LLM backend spec: {spec}")
+
+
+if __name__ == "__main__":
+    # python llm_backend.py [port] [mock options], e.g. 8765 latency=0.3,error_rate=0.02
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else MOCK_SERVER_PORT
+    options = parse_options(sys.argv[2]) if len(sys.argv) > 2 else {}
+    serve_mock(MockBackend(**options), port=port)
@@ -0,0 +1,164 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# --- Configuration ---
+CACHE_FILE = os.getenv(
+    "LLM_CACHE_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_cache.db"),
+)
+MAX_CACHE_BYTES = 512 * 1024 * 1024  # Compressed size before LRU eviction kicks in
+CACHE_DISABLED = os.getenv("LLM_CACHE_DISABLE", "") not in ("", "0")
+
+
+def make_cache_key(model_name, prompt, input_text=""):
+    """
+    Content address of one LLM call.
+
+    Args:
+        model_name: Model the request is sent to.
+        prompt: The full prompt (instructions) of the request.
+        input_text: The per-item input appended to the prompt, if any.
+
+    Returns:
+        A hex SHA-256 digest over the length-prefixed parts.
+    """
+    digest = hashlib.sha256()
+    for part in (model_name, prompt, input_text):
+        encoded = part.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class LLMCache:
+    """
+    On-disk cache of raw LLM response text, keyed by make_cache_key.
+
+    Responses are stored zlib-compressed in a SQLite file and evicted least
+    recently used first once the compressed total exceeds `max_bytes`.
+    Safe to share between threads. With `enabled=False` every lookup misses
+    and nothing is stored, so callers don't need a separate code path. With
+    `refresh=True` every lookup misses but responses are still stored,
+    replacing the stale entries they were re-requested for.
+    """
+
+    def __init__(
+        self, path=CACHE_FILE, max_bytes=MAX_CACHE_BYTES, enabled=None, refresh=False
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = not CACHE_DISABLED if enabled is None else enabled
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = None
+        self.total_bytes = 0
+
+        if self.enabled:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)"
+            )
+            self.conn.commit()
+            self.total_bytes = self.conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+
+    def get(self, key):
+        """Returns the cached response text for `key`, or None on a miss."""
+        if not self.enabled or self.refresh:
+            self.misses += 1
+            return None
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT body FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self.conn.commit()
+            self.hits += 1
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, key, text):
+        """Stores a response. Empty responses are never cached."""
+        if not self.enabled or not text:
+            return
+        body = zlib.compress(text.encode("utf-8"))
+        with self.lock:
+            old = self.conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, body, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, body, len(body), time.time()),
+            )
+            self.total_bytes += len(body) - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        # Drop down to 90% of the limit so eviction doesn't run on every put
+        target = self.max_bytes * 0.9
+        while self.total_bytes > target:
+            rows = self.conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_used LIMIT 256"
+            ).fetchall()
+            if not rows:
+                self.total_bytes = 0
+                break
+            for key, size in rows:
+                if self.total_bytes <= target:
+                    break
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.total_bytes -= size
+
+    def get_or_call(self, model_name, prompt, input_text, call):
+        """
+        Returns the cached response for the request, calling `call()` to
+        produce (and cache) the response text on a miss. A `model_name` of
+        None (a backend's cache_name for test backends) bypasses the cache.
+        """
+        if model_name is None:
+            return call()
+        key = make_cache_key(model_name, prompt, input_text)
+        text = self.get(key)
+        if text is None:
+            text = call()
+            self.put(key, text)
+        return text
+
+    def stats(self):
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        state = " (disabled)" if not self.enabled else " (refresh)" if self.refresh else ""
+        return (
+            f"LLM cache{state}: {self.hits} hits, {self.misses} misses "
+            f"({rate:.0%} hit rate), {self.total_bytes / 1e6:.1f} MB on disk"
+        )
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,383 @@
+import json
+import re
+import sys
+import time
+
+# Quote characters the model (or our own prompts) uses in place of ASCII quotes
+SMART_QUOTES = "“”„‟«»"
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+KEY_COLON = re.compile(r"\s*:")
+OUTSIDE_SPECIAL = re.compile('["{}\\[\\]/A-Za-z_' + SMART_QUOTES + "]")
+IN_ASCII_STRING = re.compile(r'[\\"]')
+IN_SMART_STRING = re.compile('[\\\\"' + SMART_QUOTES + "]")
+CLOSERS = {"{": "}", "[": "]"}
+
+# What parse_llm_json had to do to decode a response
+REPAIR_COSMETIC = "cosmetic"  # Fences, trailing commas, smart quotes, unquoted keys...
+REPAIR_TRUNCATED = "truncated"  # The response was cut off and closed artificially
+
+
+class LLMJSONError(ValueError):
+    """Raised when a response holds no usable JSON or fails schema validation."""
+
+
+def extract_json_payload(text):
+    """
+    Returns the JSON part of an LLM response: the contents of the first
+    ``` fence if it holds JSON, otherwise everything from the first '{' or
+    '[' on, with chatty text before it dropped.
+    """
+    fence = text.find("```")
+    if fence != -1:
+        start = text.find("\n", fence)
+        start = fence + 3 if start == -1 else start + 1
+        end = text.find("```", start)
+        fenced = text[start:] if end == -1 else text[start:end]
+        if "{" in fenced or "[" in fenced:
+            text = fenced
+
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        raise LLMJSONError("No JSON object or array in response")
+    return text[min(starts) :].strip()
+
+
+def repair_json(payload):
+    """
+    Single pass over `payload` that fixes the defects we see from the model:
+
+    - smart quotes used as string delimiters (ASCII-quoted strings may still
+      contain them as text)
+    - unquoted object keys, e.g. {correctAnswer: "..."}
+    - trailing commas before '}' or ']'
+    - // line comments, copied from the example in our prompt
+    - truncation: an unterminated string is closed, then the open arrays and
+      objects are closed in order
+
+    Text after the top-level value is dropped. Runs of ordinary characters
+    are copied as slices, so the cost is per token rather than per character.
+    """
+    return _repair(payload)[0]
+
+
+def _repair(payload):
+    """repair_json that also reports whether the payload was truncated."""
+    out = []
+    truncated = False
+    stack = []
+    i = 0
+    n = len(payload)
+
+    while i < n:
+        match = OUTSIDE_SPECIAL.search(payload, i)
+        if match is None:
+            out.append(payload[i:])
+            break
+        pos = match.start()
+        if pos > i:
+            out.append(payload[i:pos])
+        char = payload[pos]
+        i = pos + 1
+
+        if char == '"' or char in SMART_QUOTES:
+            # Copy the string, normalising its delimiters to ASCII quotes
+            smart = char != '"'
+            string_special = IN_SMART_STRING if smart else IN_ASCII_STRING
+            out.append('"')
+            while True:
+                match = string_special.search(payload, i)
+                if match is None:
+                    out.append(payload[i:])
+                    out.append('"')  # Truncated inside a string
+                    truncated = True
+                    i = n
+                    break
+                pos = match.start()
+                out.append(payload[i:pos])
+                char = payload[pos]
+                if char == "\\":
+                    out.append(payload[pos : pos + 2])
+                    i = pos + 2
+                elif char == '"' and smart:
+                    out.append('\\"')  # ASCII quote inside a smart-quoted string
+                    i = pos + 1
+                else:
+                    out.append('"')
+                    i = pos + 1
+                    break
+        elif char in "{[":
+            stack.append(char)
+            out.append(char)
+        elif char in "}]":
+            _strip_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(char)
+            if not stack:
+                return "".join(out), truncated  # End of the top-level value
+        elif char == "/":
+            if payload.startswith("/", i):
+                newline = payload.find("\n", i)
+                i = n if newline == -1 else newline
+            else:
+                out.append(char)
+        else:
+            match = IDENTIFIER_PATTERN.match(payload, pos)
+            word = match.group(0)
+            i = match.end()
+            rest = KEY_COLON.match(payload, i)
+            if rest and stack and stack[-1] == "{":
+                out.append(f'"{word}"')  # Unquoted key
+            else:
+                out.append(word)
+
+    if stack:
+        truncated = True
+        _strip_dangling(out)
+        out.extend(CLOSERS[opener] for opener in reversed(stack))
+    return "".join(out), truncated
+
+
+def _strip_trailing_comma(out):
+    """Removes whitespace and one comma from the end of the output pieces."""
+    while out:
+        last = out[-1].rstrip()
+        if not last:
+            out.pop()
+            continue
+        out[-1] = last[:-1] if last.endswith(",") else last
+        return
+
+
+def _strip_dangling(out):
+    """Drops a trailing comma or a key whose value was cut off."""
+    text = "".join(out).rstrip()
+    if text.endswith(","):
+        text = text[:-1].rstrip()
+    if text.endswith(":"):
+        text = text[:-1].rstrip()
+        if text.endswith('"'):
+            start = text.rfind('"', 0, len(text) - 1)
+            while start > 0 and text[start - 1] == "\\":
+                start = text.rfind('"', 0, start - 1)
+            text = text[: max(start, 0)].rstrip()
+        if text.endswith(","):
+            text = text[:-1].rstrip()
+    out[:] = [text]
+
+
+def _truncate_to_last_element(payload):
+    """
+    Fallback for truncated payloads that still don't parse after repair_json:
+    cut back to the last comma outside a string and close from there.
+    """
+    depth = 0
+    in_string = False
+    escaped = False
+    last_comma = -1
+    for i, char in enumerate(payload):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+        elif char == "," and depth > 0:
+            last_comma = i
+    if last_comma == -1:
+        return None
+    return repair_json(payload[:last_comma])
+
+
+def parse_llm_json(text):
+    """
+    Extracts and decodes the JSON in an LLM response, repairing it if plain
+    json.loads fails.
+
+    Returns:
+        (data, repair): `repair` is None if the JSON decoded as is,
+        REPAIR_COSMETIC if only formatting defects were fixed and
+        REPAIR_TRUNCATED if the response was cut off, in which case the last
+        values in `data` may be incomplete.
+
+    Raises:
+        LLMJSONError: if no JSON value could be recovered.
+    """
+    payload = extract_json_payload(text)
+    try:
+        return json.loads(payload, strict=False), None
+    except json.JSONDecodeError:
+        pass
+
+    repaired, truncated = _repair(payload)
+    repair = REPAIR_TRUNCATED if truncated else REPAIR_COSMETIC
+    try:
+        return json.loads(repaired, strict=False), repair
+    except json.JSONDecodeError as e:
+        error = e
+
+    shortened = _truncate_to_last_element(repaired)
+    if shortened is not None:
+        try:
+            return json.loads(shortened, strict=False), REPAIR_TRUNCATED
+        except json.JSONDecodeError:
+            pass
+    raise LLMJSONError(f"Unrepairable JSON: {error}")
+
+
+# --- Schemas ---
+def validate_enrichment(data):
+    """Returns the problems with one word's senses/examples result (empty if valid)."""
+    if not isinstance(data, dict):
+        return ["result is not an object"]
+    senses = data.get("senses")
+    if not isinstance(senses, list):
+        return ["'senses' is not an array"]
+
+    errors = []
+    summary = data.get("short_translation_summary")
+    if summary is not None and not isinstance(summary, str):
+        errors.append("'short_translation_summary' is not a string")
+    for s, sense_data in enumerate(senses):
+        if not isinstance(sense_data, dict):
+            errors.append(f"senses[{s}] is not an object")
+            continue
+        examples = sense_data.get("examples", [])
+        if not isinstance(examples, list):
+            errors.append(f"senses[{s}].examples is not an array")
+            continue
+        for e, example_data in enumerate(examples):
+            if not isinstance(example_data, dict):
+                errors.append(f"senses[{s}].examples[{e}] is not an object")
+            elif not isinstance(example_data.get("sentence_eng"), str):
+                errors.append(f"senses[{s}].examples[{e}].sentence_eng is missing")
+    return errors
+
+
+def validate_question_stem(data):
+    """
+    Returns the problems with a fill-in-the-blank question asked for without
+    wrong choices (empty if valid).
+    """
+    if not isinstance(data, dict):
+        return ["result is not an object"]
+    return [
+        f"'{key}' is not a non-empty string"
+        for key in ("question", "correctAnswer")
+        if not isinstance(data.get(key), str) or not data[key].strip()
+    ]
+
+
+def validate_question(data):
+    """Returns the problems with a fill-in-the-blank question (empty if valid)."""
+    errors = validate_question_stem(data)
+    if not isinstance(data, dict):
+        return errors
+    choices = data.get("wrongChoices")
+    if not isinstance(choices, list) or not all(isinstance(c, str) for c in choices):
+        errors.append("'wrongChoices' is not an array of strings")
+    return errors
+
+
+def decode_llm_json(text, validator=None, allow_truncated=False):
+    """
+    Extract, repair and validate in one call.
+
+    Args:
+        text: Raw LLM response text.
+        validator: Optional schema function such as validate_enrichment.
+        allow_truncated: Accept responses that were cut off. Otherwise they
+                  are rejected, since a value cut mid-string still validates.
+
+    Returns:
+        The decoded JSON value.
+
+    Raises:
+        LLMJSONError: if nothing could be decoded, the response was truncated
+                  or validation failed.
+    """
+    data, repair = parse_llm_json(text)
+    if repair == REPAIR_TRUNCATED and not allow_truncated:
+        raise LLMJSONError("Response was truncated")
+    if validator is not None:
+        errors = validator(data)
+        if errors:
+            raise LLMJSONError("; ".join(errors))
+    return data
+
+
+# --- Microbenchmark ---
+def _benchmark_corpus():
+    entry = {
+        "short_translation_summary": "帳戶；認為是；描述",
+        "senses": [
+            {
+                "sense_order": i,
+                "translation_chn": "帳戶，戶口",
+                "definition_eng": "an arrangement with a bank",
+                "part_of_speech": "noun",
+                "examples": [
+                    {
+                        "example_order": j,
+                        "phrase_marker": None,
+                        "sentence_eng": "Check your account balance online.",
+                        "sentence_chn": "在線查詢您的帳戶餘額。",
+                        "source": "generated",
+                    }
+                    for j in range(3)
+                ],
+            }
+            for i in range(4)
+        ],
+    }
+    clean = json.dumps(entry, ensure_ascii=False, indent=2)
+    trailing = clean.replace('"generated"\n', '"generated",\n')
+    return {
+        "clean": clean,
+        "fenced": f"```json\n{clean}\n```",
+        "chatty": f"Sure! Here is the parsed entry:\n```json\n{clean}\n```\nLet me know!",
+        "trailing_commas": trailing,
+        "comment": clean.replace("\n  ]\n}", ",\n    // ... other senses\n  ]\n}"),
+        "truncated": clean[: int(len(clean) * 0.7)],
+        "smart_quotes": '{”question”: “He ___ the plan.”, correctAnswer: “abandoned” ,“wrongChoices”: [”adopted”, ”adapted”, ”adepted”]}',
+    }
+
+
+def _legacy_decode(text):
+    return json.loads(text.strip().replace("```json", "").replace("```", ""))
+
+
+def run_benchmark(iterations=2000):
+    corpus = _benchmark_corpus()
+    print(f"{'case':<16}{'legacy':>8}{'new':>8}{'µs/decode':>12}")
+    for case, text in corpus.items():
+        try:
+            _legacy_decode(text)
+            legacy = "ok"
+        except json.JSONDecodeError:
+            legacy = "FAIL"
+        try:
+            parse_llm_json(text)
+            new = "ok"
+        except LLMJSONError:
+            new = "FAIL"
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            try:
+                parse_llm_json(text)
+            except LLMJSONError:
+                pass
+        per_call = (time.perf_counter() - start) / iterations * 1e6
+        print(f"{case:<16}{legacy:>8}{new:>8}{per_call:>12.1f}")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
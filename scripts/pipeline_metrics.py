@@ -0,0 +1,170 @@
+import collections
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# --- Configuration ---
+METRICS_INTERVAL = 10.0  # Seconds between snapshots written to disk
+METRICS_WINDOW = 5000  # Latest samples per stage used for the percentiles
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def percentile(sorted_samples, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    index = min(int(q * len(sorted_samples)), len(sorted_samples) - 1)
+    return sorted_samples[index]
+
+
+class PipelineMetrics:
+    """
+    Thread-safe counters and per-stage latency histograms for the LLM
+    pipelines.
+
+    Every `interval` seconds a background thread appends a JSON snapshot to
+    `jsonl_path` and rewrites `prom_path` in Prometheus text format (for a
+    node_exporter textfile collector or a plain `cat`). Either path may be
+    None to skip that output.
+
+    Args:
+        name: Metric name prefix, e.g. "enrich" or "questions".
+        jsonl_path: JSON-lines file that snapshots are appended to.
+        prom_path: Prometheus text file that is replaced on every snapshot.
+        interval: Seconds between snapshots.
+        throughput_counter: Counter reported as `<name>_per_second`.
+    """
+
+    def __init__(
+        self,
+        name,
+        jsonl_path=None,
+        prom_path=None,
+        interval=METRICS_INTERVAL,
+        throughput_counter="words_done",
+    ):
+        self.name = name
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.interval = interval
+        self.throughput_counter = throughput_counter
+        self.lock = threading.Lock()
+        self.counters = collections.Counter()
+        self.samples = collections.defaultdict(
+            lambda: collections.deque(maxlen=METRICS_WINDOW)
+        )
+        self.stage_counts = collections.Counter()
+        self.stage_sums = collections.Counter()
+        self.started = time.monotonic()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def inc(self, counter, amount=1):
+        with self.lock:
+            self.counters[counter] += amount
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            self.samples[stage].append(seconds)
+            self.stage_counts[stage] += 1
+            self.stage_sums[stage] += seconds
+
+    @contextmanager
+    def time(self, stage):
+        """Times the enclosed block into `stage`'s histogram."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.monotonic() - start)
+
+    def snapshot(self):
+        with self.lock:
+            counters = dict(self.counters)
+            stages = {}
+            for stage, samples in self.samples.items():
+                ordered = sorted(samples)
+                stages[stage] = {
+                    "count": self.stage_counts[stage],
+                    "sum": self.stage_sums[stage],
+                    **{f"p{int(q * 100)}": percentile(ordered, q) for q in QUANTILES},
+                }
+        elapsed = time.monotonic() - self.started
+        return {
+            "timestamp": time.time(),
+            "elapsed": elapsed,
+            "counters": counters,
+            "stages": stages,
+            f"{self.throughput_counter}_per_second": counters.get(
+                self.throughput_counter, 0
+            )
+            / max(elapsed, 1e-9),
+        }
+
+    def to_prometheus(self, snapshot):
+        lines = []
+        for counter, value in sorted(snapshot["counters"].items()):
+            metric = f"{self.name}_{counter}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+
+        metric = f"{self.name}_stage_seconds"
+        lines.append(f"# TYPE {metric} summary")
+        for stage, stats in sorted(snapshot["stages"].items()):
+            for q in QUANTILES:
+                lines.append(
+                    f'{metric}{{stage="{stage}",quantile="{q}"}} '
+                    f"{stats[f'p{int(q * 100)}']:.6f}"
+                )
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {stats["sum"]:.6f}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {stats["count"]}')
+
+        rate_key = f"{self.throughput_counter}_per_second"
+        metric = f"{self.name}_{rate_key}"
+        lines += [f"# TYPE {metric} gauge", f"{metric} {snapshot[rate_key]:.3f}"]
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        """Writes one snapshot to the configured files and returns it."""
+        snapshot = self.snapshot()
+        if self.jsonl_path:
+            with open(self.jsonl_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(snapshot) + "\n")
+        if self.prom_path:
+            tmp_path = self.prom_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                file.write(self.to_prometheus(snapshot))
+            os.replace(tmp_path, self.prom_path)  # Scrapers never see a partial file
+        return snapshot
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.write()
+
+    def start(self):
+        self.started = time.monotonic()
+        if self.jsonl_path or self.prom_path:
+            self.thread = threading.Thread(
+                target=self._run, name="Metrics", daemon=True
+            )
+            self.thread.start()
+        return self
+
+    def close(self):
+        """Stops the background thread, writes a final snapshot and prints a summary."""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        snapshot = self.write()
+
+        rate_key = f"{self.throughput_counter}_per_second"
+        print(f"{self.name}: {snapshot[rate_key]:.2f} {rate_key.replace('_', ' ')}")
+        for counter, value in sorted(snapshot["counters"].items()):
+            print(f"  {counter}: {value}")
+        for stage, stats in sorted(snapshot["stages"].items()):
+            print(
+                f"  {stage}: n={stats['count']} p50={stats['p50'] * 1000:.1f}ms "
+                f"p95={stats['p95'] * 1000:.1f}ms p99={stats['p99'] * 1000:.1f}ms"
+            )
+        return snapshot
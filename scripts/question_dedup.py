@@ -0,0 +1,381 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import time
+from array import array
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# --- Configuration ---
+DB_FILE = "vocabulary.db"
+SIGNATURE_FILE = os.getenv(
+    "QUESTION_MINHASH_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "question_minhash.db"),
+)  # Kept out of the app database, which ships as an asset
+REPORT_FILE = "duplicate_questions.json"
+SHINGLE_SIZE = 3  # Words per shingle
+NUM_PERM = 64  # MinHash signature length
+BANDS = 16  # LSH bands of NUM_PERM // BANDS rows: candidates from ~45% similarity
+DUPLICATE_THRESHOLD = 0.7  # Shingle Jaccard similarity that counts as a duplicate
+SEED = 1
+SIGNATURE_VERSION = f"{NUM_PERM}:{SHINGLE_SIZE}:{SEED}"  # Stored rows of another version are rehashed
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+_rng = random.Random(SEED)
+PERMUTATIONS = [
+    (_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+TOKEN = re.compile(r"_+|[a-z0-9']+")
+
+
+# --- MinHash ---
+def shingles(text):
+    """Lower-cased word n-grams of a question; any blank becomes "_"."""
+    tokens = ["_" if token[0] == "_" else token for token in TOKEN.findall(text.lower())]
+    if len(tokens) <= SHINGLE_SIZE:
+        return {" ".join(tokens)}
+    return {
+        " ".join(tokens[i : i + SHINGLE_SIZE])
+        for i in range(len(tokens) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(text):
+    """
+    The MinHash signature of a question: for each of NUM_PERM universal
+    hash functions, the smallest hash over its shingles.
+    """
+    hashes = [
+        int.from_bytes(
+            hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "big"
+        )
+        for shingle in shingles(text)
+    ]
+    return array(
+        "Q",
+        [
+            min((a * h + b) % MERSENNE_PRIME for h in hashes) & MAX_HASH
+            for a, b in PERMUTATIONS
+        ],
+    )
+
+
+def jaccard(shingles_a, shingles_b):
+    return len(shingles_a & shingles_b) / len(shingles_a | shingles_b)
+
+
+def text_key(question):
+    """Content address of a question's text in the signature store."""
+    return hashlib.blake2b(question.encode("utf-8"), digest_size=16).digest()
+
+
+class QuestionDedupIndex:
+    """
+    MinHash/LSH index over questions.question for near-duplicate lookups.
+
+    Each signature is split into BANDS bands and every band is hashed into a
+    bucket, so the questions that share a bucket with a new one are its only
+    candidates and are verified with the exact shingle similarity; no
+    pairwise pass over the table is needed. Signatures are stored by question
+    text in a separate SQLite file, so loading the index only hashes
+    questions whose text it has not seen before and the app database keeps
+    its schema.
+
+    Args:
+        db_file: Database with the questions table (only read).
+        threshold: Similarity from which two questions are near-duplicates.
+        signature_file: Database the signatures are kept in.
+    """
+
+    def __init__(
+        self,
+        db_file: str = DB_FILE,
+        threshold: float = DUPLICATE_THRESHOLD,
+        signature_file: str = SIGNATURE_FILE,
+    ):
+        self.db_file = db_file
+        self.threshold = threshold
+        self.signature_file = signature_file
+        self.rows = NUM_PERM // BANDS
+        self.signatures: Dict[int, array] = {}
+        self.texts: Dict[int, str] = {}
+        self.shingle_cache: Dict[int, set] = {}
+        self.buckets = [defaultdict(list) for _ in range(BANDS)]
+        self.pending: Dict[str, array] = {}  # Added but not yet in the table
+        self.next_pending_key = -1
+        self.sync()
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def _bands(self, signature):
+        for band in range(BANDS):
+            yield band, tuple(signature[band * self.rows : (band + 1) * self.rows])
+
+    def _shingles(self, key):
+        if key not in self.shingle_cache:
+            self.shingle_cache[key] = shingles(self.texts[key])
+        return self.shingle_cache[key]
+
+    def _index(self, key, text, signature):
+        self.signatures[key] = signature
+        self.texts[key] = text
+        for band, band_key in self._bands(signature):
+            self.buckets[band][band_key].append(key)
+
+    def _unindex(self, key):
+        signature = self.signatures.pop(key)
+        del self.texts[key]
+        self.shingle_cache.pop(key, None)
+        for band, band_key in self._bands(signature):
+            bucket = self.buckets[band][band_key]
+            bucket.remove(key)
+            if not bucket:
+                del self.buckets[band][band_key]
+
+    def sync(self):
+        """
+        Indexes the questions that are not indexed yet, hashing those whose
+        text has no stored signature (or one of an older SIGNATURE_VERSION),
+        and drops the questions that were deleted.
+
+        Returns:
+            The number of questions that were hashed.
+        """
+        conn = sqlite3.connect(self.db_file)
+        try:
+            questions = conn.execute(
+                "SELECT id, question FROM questions WHERE question IS NOT NULL"
+            ).fetchall()
+        finally:
+            conn.close()
+
+        store = sqlite3.connect(self.signature_file)
+        try:
+            store.execute(
+                """
+                CREATE TABLE IF NOT EXISTS question_minhash (
+                    text_key BLOB PRIMARY KEY,
+                    version TEXT NOT NULL,
+                    signature BLOB NOT NULL
+                )
+            """
+            )
+            stored = dict(
+                store.execute(
+                    "SELECT text_key, signature FROM question_minhash WHERE version = ?",
+                    (SIGNATURE_VERSION,),
+                )
+            )
+
+            current = {question_id for question_id, _ in questions}
+            for key in [key for key in self.signatures if key >= 0 and key not in current]:
+                self._unindex(key)
+
+            new_rows = []
+            for question_id, question in questions:
+                if question_id in self.signatures:
+                    continue
+                key = text_key(question)
+                if key in stored:
+                    self._index(question_id, question, array("Q", stored[key]))
+                    continue
+                signature = self.pending.get(question) or minhash(question)
+                self._index(question_id, question, signature)
+                stored[key] = signature.tobytes()
+                new_rows.append((key, SIGNATURE_VERSION, stored[key]))
+            store.executemany(
+                "INSERT OR REPLACE INTO question_minhash (text_key, version, signature) VALUES (?, ?, ?)",
+                new_rows,
+            )
+            store.commit()
+        finally:
+            store.close()
+
+        # Questions added through `add` are in the table now (or were dropped)
+        for key in [key for key in self.signatures if key < 0]:
+            self._unindex(key)
+        self.pending.clear()
+        return len(new_rows)
+
+    def query(self, question: str, signature=None) -> List[Tuple[int, float]]:
+        """
+        Returns the (question_id, similarity) pairs of the indexed questions
+        that are near-duplicates of `question`, most similar first. Questions
+        added but not synced yet have negative ids.
+        """
+        signature = signature or minhash(question)
+        candidates = set()
+        for band, band_key in self._bands(signature):
+            candidates.update(self.buckets[band].get(band_key, ()))
+        question_shingles = shingles(question)
+        duplicates = []
+        for key in candidates:
+            score = jaccard(question_shingles, self._shingles(key))
+            if score >= self.threshold:
+                duplicates.append((key, score))
+        duplicates.sort(key=lambda item: (-item[1], item[0]))
+        return duplicates
+
+    def add(self, question: str) -> List[Tuple[int, float]]:
+        """
+        Checks a question that is about to be inserted and indexes it, so
+        later questions of the same run are compared against it too.
+
+        Returns:
+            Its near-duplicates, as in query.
+        """
+        signature = minhash(question)
+        duplicates = self.query(question, signature)
+        self.pending[question] = signature
+        self._index(self.next_pending_key, question, signature)
+        self.next_pending_key -= 1
+        return duplicates
+
+    def clusters(self):
+        """
+        Groups the indexed questions into near-duplicate clusters.
+
+        Each bucket is scanned once: a question joins the first cluster seen
+        in that bucket whose representative it matches, so a large group of
+        copies costs one comparison per member instead of one per pair.
+
+        Returns:
+            Lists of question ids (ascending) with more than one member.
+        """
+        parent = {}
+
+        def find(key):
+            root = key
+            while parent.get(root, root) != root:
+                root = parent[root]
+            while key != root:
+                parent[key], key = root, parent.get(key, key)
+            return root
+
+        for band_buckets in self.buckets:
+            for bucket in band_buckets.values():
+                if len(bucket) < 2:
+                    continue
+                representatives = []
+                for key in bucket:
+                    root = find(key)
+                    for representative in representatives:
+                        other = find(representative)
+                        if other == root:
+                            break
+                        if (
+                            jaccard(self._shingles(key), self._shingles(representative))
+                            >= self.threshold
+                        ):
+                            parent[max(root, other)] = min(root, other)
+                            break
+                    else:
+                        representatives.append(key)
+
+        groups = defaultdict(list)
+        for key in self.signatures:
+            groups[find(key)].append(key)
+        return [sorted(members) for members in groups.values() if len(members) > 1]
+
+
+# --- Bulk Report ---
+def dedup_report(
+    db_file=DB_FILE,
+    threshold=DUPLICATE_THRESHOLD,
+    report_path=REPORT_FILE,
+    signature_file=SIGNATURE_FILE,
+):
+    """
+    Writes the near-duplicate clusters of the questions table to a JSON file.
+    Nothing is deleted; each cluster suggests keeping its lowest id.
+
+    Returns:
+        The list of clusters written.
+    """
+    start = time.perf_counter()
+    index = QuestionDedupIndex(db_file, threshold, signature_file)
+    indexed = time.perf_counter() - start
+    clusters = index.clusters()
+
+    conn = sqlite3.connect(db_file)
+    try:
+        answers = {}
+        ids = [key for members in clusters for key in members]
+        for i in range(0, len(ids), 500):  # SQLite variable limit
+            chunk = ids[i : i + 500]
+            answers.update(
+                conn.execute(
+                    "SELECT id, correct_answer FROM questions "
+                    f"WHERE id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+            )
+    finally:
+        conn.close()
+
+    report = []
+    for members in sorted(clusters, key=lambda members: (-len(members), members[0])):
+        keep = members[0]
+        report.append(
+            {
+                "keep": keep,
+                "duplicates": [
+                    {
+                        "id": key,
+                        "question": index.texts[key],
+                        "correct_answer": answers.get(key),
+                        "similarity": round(
+                            jaccard(index._shingles(keep), index._shingles(key)), 3
+                        ),
+                    }
+                    for key in members
+                ],
+            }
+        )
+    with open(report_path, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+    redundant = sum(len(members) - 1 for members in clusters)
+    print(
+        f"Indexed {len(index)} questions in {indexed:.2f} s: {len(clusters)} near-duplicate "
+        f"clusters, {redundant} redundant questions. Report written to {report_path}"
+    )
+    return report
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Find near-duplicate questions with MinHash/LSH."
+    )
+    parser.add_argument("--db", default=DB_FILE, help="SQLite database")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DUPLICATE_THRESHOLD,
+        help="Shingle Jaccard similarity that counts as a duplicate",
+    )
+    parser.add_argument("--report", default=REPORT_FILE, help="Output JSON file")
+    parser.add_argument(
+        "--signatures",
+        default=SIGNATURE_FILE,
+        help="SQLite file the MinHash signatures are kept in (not the app database)",
+    )
+    parser.add_argument(
+        "--check", metavar="QUESTION", help="Only list the near-duplicates of one question"
+    )
+    args = parser.parse_args()
+
+    if args.check:
+        index = QuestionDedupIndex(args.db, args.threshold, args.signatures)
+        for question_id, score in index.query(args.check):
+            print(f"{question_id}\t{score:.2f}")
+    else:
+        dedup_report(args.db, args.threshold, args.report, args.signatures)
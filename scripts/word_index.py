@@ -0,0 +1,90 @@
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+# --- Configuration ---
+DB_FILE = "vocabulary.db"
+
+
+class WordIndex:
+    """
+    In-memory word -> words.id index, loaded with a single query.
+
+    Lookups match the exact spelling, like `WHERE word = ?`. With `casefold`
+    they fall back to the case-folded one ("Abandon" finds "abandon"); when
+    several stored words fold to the same key, the lowest id wins.
+
+    Args:
+        db_file: Database with the `words(id, word)` table.
+        casefold: Fall back to case-insensitive matches.
+    """
+
+    def __init__(self, db_file: str = DB_FILE, casefold: bool = False):
+        self.db_file = db_file
+        self.casefold = casefold
+        self.exact: Dict[str, int] = {}
+        self.folded: Dict[str, int] = {}
+
+        conn = sqlite3.connect(db_file)
+        try:
+            for word_id, word in conn.execute(
+                "SELECT id, word FROM words WHERE word IS NOT NULL ORDER BY id"
+            ):
+                self.exact.setdefault(word, word_id)
+                if casefold:
+                    self.folded.setdefault(word.casefold(), word_id)
+        finally:
+            conn.close()
+
+    def __len__(self):
+        return len(self.exact)
+
+    def __contains__(self, word):
+        return self.get(word) is not None
+
+    def get(self, word: str) -> Optional[int]:
+        """Returns the id of `word`, or None if it is not in the table."""
+        word_id = self.exact.get(word)
+        if word_id is None and self.casefold:
+            word_id = self.folded.get(word.casefold())
+        return word_id
+
+    def resolve(self, words: Iterable[str]) -> Dict[str, int]:
+        """Maps every word that is found to its id, keeping the input order."""
+        word_to_id = {}
+        for word in words:
+            word_id = self.get(word)
+            if word_id is not None:
+                word_to_id[word] = word_id
+        return word_to_id
+
+
+_indexes: Dict[Tuple[str, bool], WordIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_word_index(db_file: str = DB_FILE, casefold: bool = False) -> WordIndex:
+    """Returns the shared index for `db_file`, loading it on first use."""
+    with _indexes_lock:
+        key = (db_file, casefold)
+        if key not in _indexes:
+            _indexes[key] = WordIndex(db_file, casefold)
+        return _indexes[key]
+
+
+def get_word_id(word: str, db_file: str = DB_FILE) -> Optional[int]:
+    """
+    Retrieves the ID of a word from the database.
+
+    Args:
+        word: The word to search for.
+        db_file: The database to search.
+
+    Returns:
+        The ID of the word if found, otherwise None.
+    """
+    try:
+        return get_word_index(db_file).get(word)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None